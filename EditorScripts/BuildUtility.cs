@@ -7,22 +7,130 @@ using System.Collections.Generic;
 //try avoid type name conflict with prefix
 public static class _BuildUtility
 {
+    //symbols of each group changed in the current transaction, written by CommitSymbols
+    static Dictionary<BuildTargetGroup, List<string>> pendingSymbols;
+
+    static List<string> SplitSymbols(string symbols)
+    {
+        var list = new List<string>();
+        if (!string.IsNullOrEmpty(symbols))
+        {
+            foreach (var item in symbols.Split(';'))
+            {
+                var symbol = item.Trim();
+                if (symbol.Length > 0 && !list.Contains(symbol))
+                    list.Add(symbol);
+            }
+        }
+        return list;
+    }
+
+    static List<string> WorkingSymbols(BuildTargetGroup group)
+    {
+        List<string> working;
+        if (!pendingSymbols.TryGetValue(group, out working))
+        {
+            working = SplitSymbols(PlayerSettings.GetScriptingDefineSymbolsForGroup(group));
+            pendingSymbols.Add(group, working);
+        }
+        return working;
+    }
+
+    //collect symbol changes until CommitSymbols, each changed group is written once so scripts recompile at most once
+    public static void BeginSymbols()
+    {
+        if (pendingSymbols == null)
+            pendingSymbols = new Dictionary<BuildTargetGroup, List<string>>();
+    }
+
+    public static string CommitSymbols()
+    {
+        var summary = new List<string>();
+        if (pendingSymbols != null)
+        {
+            foreach (var pair in pendingSymbols)
+            {
+                var lastSymbols = PlayerSettings.GetScriptingDefineSymbolsForGroup(pair.Key);
+                var newSymbols = string.Join(";", pair.Value.ToArray());
+                //skip unchanged groups, writing the same symbols still triggers a recompile
+                var changed = newSymbols != string.Join(";", SplitSymbols(lastSymbols).ToArray());
+                if (changed)
+                    PlayerSettings.SetScriptingDefineSymbolsForGroup(pair.Key, newSymbols);
+                summary.Add(string.Format("{0}: {1} ({2})", pair.Key, newSymbols, changed ? "changed" : "unchanged"));
+            }
+            pendingSymbols = null;
+        }
+        return string.Join("\n", summary.ToArray());
+    }
+
+    //discard the open transaction left by an earlier request, returns the groups that were pending
+    public static string ResetSymbols()
+    {
+        if (pendingSymbols == null)
+            return null;
+        var summary = new List<string>();
+        foreach (var pair in pendingSymbols)
+            summary.Add(string.Format("{0}: {1}", pair.Key, string.Join(";", pair.Value.ToArray())));
+        pendingSymbols = null;
+        return string.Join("\n", summary.ToArray());
+    }
+
     public static void AppendSymbolsForGroup(BuildTargetGroup group, string symbols)
     {
-        var lastSymbols = PlayerSettings.GetScriptingDefineSymbolsForGroup(group);
-        var newSymbols = string.IsNullOrEmpty(symbols) ? new List<string>() : new List<string>(symbols.Split(';'));
-        newSymbols.RemoveAll(item => lastSymbols.Contains(item));
-        newSymbols.Insert(0, lastSymbols);
-        PlayerSettings.SetScriptingDefineSymbolsForGroup(group, string.Join(";", newSymbols.ToArray()));
+        var inTransaction = pendingSymbols != null;
+        BeginSymbols();
+        var working = WorkingSymbols(group);
+        foreach (var symbol in SplitSymbols(symbols))
+        {
+            if (!working.Contains(symbol))
+                working.Add(symbol);
+        }
+        if (!inTransaction)
+            CommitSymbols();
     }
 
     public static void DeleteSymbolsForGroup(BuildTargetGroup group, string symbols)
     {
-        var lastSymbols = PlayerSettings.GetScriptingDefineSymbolsForGroup(group);
-        var newSymbols = string.IsNullOrEmpty(lastSymbols) ? new List<string>() : new List<string>(lastSymbols.Split(';'));
-        var deleteSymbols = string.IsNullOrEmpty(symbols) ? new List<string>() : new List<string>(symbols.Split(';'));
-        newSymbols.RemoveAll(item => deleteSymbols.Contains(item));
-        PlayerSettings.SetScriptingDefineSymbolsForGroup(group, string.Join(";", newSymbols.ToArray()));
+        var inTransaction = pendingSymbols != null;
+        BeginSymbols();
+        var working = WorkingSymbols(group);
+        var deleteSymbols = SplitSymbols(symbols);
+        working.RemoveAll(item => deleteSymbols.Contains(item));
+        if (!inTransaction)
+            CommitSymbols();
+    }
+
+    //apply changes in format Group:+SYMBOL1;SYMBOL2 or Group:-SYMBOL1;SYMBOL2 in order, then commit once
+    //changes are left pending when called inside an open transaction
+    public static string ApplySymbols(string[] changes)
+    {
+        var inTransaction = pendingSymbols != null;
+        BeginSymbols();
+        try
+        {
+            foreach (var change in changes)
+            {
+                var index = change.IndexOf(':');
+                if (index <= 0 || index + 1 >= change.Length || (change[index + 1] != '+' && change[index + 1] != '-'))
+                {
+                    throw new System.Exception(string.Format("Invalid symbol change: {0}", change));
+                }
+                var group = (BuildTargetGroup)System.Enum.Parse(typeof(BuildTargetGroup), change.Substring(0, index), true);
+                var symbols = change.Substring(index + 2);
+                if (change[index + 1] == '+')
+                    AppendSymbolsForGroup(group, symbols);
+                else
+                    DeleteSymbolsForGroup(group, symbols);
+            }
+        }
+        catch
+        {
+            //only drop the transaction opened here, the enclosing one belongs to the caller
+            if (!inTransaction)
+                pendingSymbols = null;
+            throw;
+        }
+        return inTransaction ? "pending" : CommitSymbols();
     }
 
     public static void BuildPlayer(string outPath, BuildTarget target, BuildOptions opt)
@@ -61,6 +169,29 @@ public static class _BuildUtility
         }
     }
 
+    //build asset bundles into a persistent outPath, unchanged bundles are skipped by unity on later builds,
+    //name and hash of each bundle is written to listFile, one bundle each line separated by tab
+    public static void BuildAssetBundles(string outPath, BuildTarget target, BuildAssetBundleOptions opt, string listFile)
+    {
+        if (!System.IO.Directory.Exists(outPath))
+        {
+            System.IO.Directory.CreateDirectory(outPath);
+        }
+
+        var manifest = BuildPipeline.BuildAssetBundles(outPath, opt | BuildAssetBundleOptions.ChunkBasedCompression, target);
+        if (manifest == null)
+        {
+            throw new System.Exception(string.Format("BuildAssetBundles failed for {0}", target));
+        }
+
+        var lines = new List<string>();
+        foreach (var name in manifest.GetAllAssetBundles())
+        {
+            lines.Add(string.Format("{0}\t{1}", name, manifest.GetAssetBundleHash(name)));
+        }
+        System.IO.File.WriteAllLines(listFile, lines.ToArray());
+    }
+
     //setting path for android external tools, fix path missing when run from jenkins
     public static void SetAndroidSdkPath(string androdiSdkPath, string javaPath, string androidNdkPath)
     {
@@ -47,6 +47,7 @@ public static class Invoker
     const string ASM_NAME_CSHARP_EDITOR = "Assembly-CSharp-Editor";
     const string ASM_NAME_CSHARP_EDITOR_FP = "Assembly-CSharp-Editor-firstpass";
     const string ASM_NAME_CSHARP_FP = "Assembly-CSharp-firstpass";
+    static readonly string[] DEFAULT_ASM_NAMES = { ASM_NAME_CSHARP_EDITOR, ASM_NAME_CSHARP_EDITOR_FP, ASM_NAME_CSHARP, ASM_NAME_CSHARP_FP };
     const string PATTERN_ENGINE_TYPES = "UnityEngine.";
     const string NAMESPACE_ENGINE = "UnityEngine";
     const string PATTERN_EDITOR_TYPES = "UnityEditor.";
@@ -65,6 +66,7 @@ public static class Invoker
         int exitCode = 0;
         try
         {
+            DiscardPendingSymbols();
             var cmdArgs = Environment.GetCommandLineArgs();
 
             var index = Array.IndexOf(cmdArgs, TAG_INVOKE_LOG);
@@ -82,6 +84,7 @@ public static class Invoker
             if (index > 0 && index + 1 < cmdArgs.Length)
             {
                 var invokeArgs = new List<string>();
+                var appendLog = false;
                 while (index < cmdArgs.Length)
                 {
                     invokeArgs.Clear();
@@ -95,7 +98,9 @@ public static class Invoker
                         }
                         invokeArgs.Add(argStr);
                     }
-                    InvokeExplict(invokeArgs.ToArray(), logFilePath);
+                    //chained invokes write their logs one after another
+                    InvokeExplict(invokeArgs.ToArray(), logFilePath, appendLog);
+                    appendLog = true;
                 }
             }
             else
@@ -116,14 +121,26 @@ public static class Invoker
         }
     }
 
+    /// <summary>
+    /// 丢弃上一次请求未提交的宏定义修改，每次请求开始时调用
+    /// </summary>
+    public static void DiscardPendingSymbols()
+    {
+        var discarded = _BuildUtility.ResetSymbols();
+        if (discarded != null)
+        {
+            Debug.LogWarning(string.Format("[Invoker]   discard uncommitted symbol changes:\n{0}", discarded));
+        }
+    }
+
     /// <summary>
     /// 使用显示参数列表调用方法
     /// </summary>
-    public static object InvokeExplict(string[] args, string logFilePath = null)
+    public static object InvokeExplict(string[] args, string logFilePath = null, bool appendLog = false)
     {
         try
         {
-            Logger.Open(logFilePath);
+            Logger.Open(logFilePath, appendLog);
             Logger.WriteLine("---------Invoke Begin---------");
             return InvokeInternal(args);
         }
@@ -135,6 +152,7 @@ public static class Invoker
         }
         finally
         {
+            ResolveCache.Report();
             Logger.WriteLine("---------Invoke End---------");
             Logger.Dispose();
         }
@@ -233,6 +251,23 @@ public static class Invoker
     /// Ref:    Unity Manual - Scripting - Scripting Overview - Special Folders and Script Compilation Order
     /// </summary>
     static Type MatchType(string typeName, string assemblyName)
+    {
+        var key = string.IsNullOrEmpty(assemblyName) ? typeName : assemblyName + ":" + typeName;
+        Type type;
+        if (ResolveCache.TryGetType(key, out type))
+        {
+            Logger.WriteLine("Type cached: {0}, {1}", typeName, type.Assembly.GetName().Name);
+            return type;
+        }
+        type = ResolveType(typeName, assemblyName);
+        if (type != null)
+        {
+            ResolveCache.AddType(key, type);
+        }
+        return type;
+    }
+
+    static Type ResolveType(string typeName, string assemblyName)
     {
         if (string.IsNullOrEmpty(assemblyName))
         {
@@ -247,45 +282,64 @@ public static class Invoker
             }
             else
             {
-                //尝试在Plugins之外的Editor目录中查找
-                var type = GetTypeByName(typeName, Assembly.Load(ASM_NAME_CSHARP_EDITOR));
-                if (type != null)
+                //依次在Plugins之外的Editor目录, Plugins中的Editor目录, Plugins之外的非Editor目录, Plugins中的非Editor目录查找
+                foreach (var name in DEFAULT_ASM_NAMES)
                 {
-                    return type;
-                }
-
-                //尝试在Plugins中的Editor目录中查找
-                type = GetTypeByName(typeName, Assembly.Load(ASM_NAME_CSHARP_EDITOR_FP));
-                if (type != null)
-                {
-                    return type;
-                }
-
-                //尝试在Plugins之外的非Editor目录中查找
-                type = GetTypeByName(typeName, Assembly.Load(ASM_NAME_CSHARP));
-                if (type != null)
-                {
-                    return type;
+                    var type = GetTypeByName(typeName, FindLoadedAssembly(name));
+                    if (type != null)
+                    {
+                        return type;
+                    }
                 }
 
-                //尝试在Plugins中的非Editor目录查找
-                type = GetTypeByName(typeName, Assembly.Load(ASM_NAME_CSHARP_FP));
-                if (type != null)
-                {
-                    return type;
-                }
+                //最后在其余已加载的程序集中查找, 包括Packages和Assembly Definition编译出的程序集
+                var found = ResolveCache.FindType(typeName);
+                Logger.WriteLine("Type {0}: {1}, {2}", found != null ? "found" : "not found", typeName,
+                    found != null ? found.Assembly.GetName().Name : "loaded assemblies");
+                return found;
             }
-            return null;
         }
         else
         {
-            //直接匹配给定的类型全名
-            return GetTypeByName(typeName, Assembly.Load(assemblyName));
+            //直接匹配给定的类型全名, 程序集尚未加载时尝试加载
+            return GetTypeByName(typeName, FindLoadedAssembly(assemblyName) ?? LoadAssembly(assemblyName));
+        }
+    }
+
+    static Assembly FindLoadedAssembly(string assemblyName)
+    {
+        foreach (var asm in AppDomain.CurrentDomain.GetAssemblies())
+        {
+            if (string.Equals(asm.GetName().Name, assemblyName, StringComparison.OrdinalIgnoreCase))
+            {
+                return asm;
+            }
+        }
+        return null;
+    }
+
+    /// <summary>
+    /// 程序集不存在时返回null, 例如项目中没有Editor目录时不会生成Assembly-CSharp-Editor
+    /// </summary>
+    static Assembly LoadAssembly(string assemblyName)
+    {
+        try
+        {
+            return Assembly.Load(assemblyName);
+        }
+        catch (Exception)
+        {
+            Logger.WriteLine("Assembly not found: {0}", assemblyName);
+            return null;
         }
     }
 
     static Type GetTypeByName(string typeName, Assembly asm)
     {
+        if (asm == null)
+        {
+            return null;
+        }
         var type = asm.GetType(typeName, false, true);
         var found = type != null;
         Logger.WriteLine("Type {0}: {1}, {2}", found ? "found" : "not found", typeName, asm.GetName().Name);
@@ -297,8 +351,7 @@ public static class Invoker
         Type type = null;
         foreach (var asm in AppDomain.CurrentDomain.GetAssemblies())
         {
-            var asmName = asm.GetName().Name;
-            if (asmName.StartsWith(moduleName))
+            if (asm.GetName().Name.StartsWith(moduleName))
             {
                 type = asm.GetType(typeName, false, true);
                 if (type != null)
@@ -319,25 +372,53 @@ public static class Invoker
         BindingFlags bindingAttr, List<string> paramStrings, out List<object> parsedParamValues)
     {
         parsedParamValues = null;
+        var key = string.Format("{0}.{1}({2})", type.AssemblyQualifiedName, methodName, paramStrings.Count);
+        MethodInfo[] candidates;
+        if (ResolveCache.TryGetMethods(key, out candidates))
+        {
+            Logger.WriteLine("Method cached: {0}, {1} candidates", methodName, candidates.Length);
+        }
+        else
+        {
+            candidates = FindCandidates(type, methodName, bindingAttr, paramStrings.Count);
+            ResolveCache.AddMethods(key, candidates);
+        }
+
+        //按查找顺序依次匹配参数, 与不使用缓存时选择的方法一致
+        foreach (var item in candidates)
+        {
+            if (MatchParameters(item, paramStrings, out parsedParamValues))
+            {
+                return item;
+            }
+        }
+        return null;
+    }
+
+    /// <summary>
+    /// 查找参数数目可以匹配的候选方法, 方法名唯一时只有一个候选
+    /// </summary>
+    static MethodInfo[] FindCandidates(Type type, string methodName, BindingFlags bindingAttr, int paramCount)
+    {
         try
         {
             var methodInfo = type.GetMethod(methodName, bindingAttr);
             if (methodInfo == null)
             {
                 //match method as property getter and setter
-                if (paramStrings.Count == 0 || paramStrings.Count == 1)
+                if (paramCount == 0 || paramCount == 1)
                 {
-                    Logger.WriteLine("No method found in type: {0}, try match as property name: {0}", type.Name, methodName);
+                    Logger.WriteLine("No method found in type: {0}, try match as property name: {1}", type.Name, methodName);
                     var prop = type.GetProperty(methodName, bindingAttr);
                     if (prop != null)
                     {
-                        methodInfo = paramStrings.Count == 0 ? prop.GetGetMethod(true) : prop.GetSetMethod(true);
+                        methodInfo = paramCount == 0 ? prop.GetGetMethod(true) : prop.GetSetMethod(true);
                     }
                 }
             }
             if (methodInfo != null)
             {
-                return MatchParameters(methodInfo, paramStrings, out parsedParamValues) ? methodInfo : null;
+                return new MethodInfo[] { methodInfo };
             }
         }
         catch (AmbiguousMatchException)
@@ -345,6 +426,7 @@ public static class Invoker
             Logger.WriteLine("AmbiguousMatchException occured, match by method name failed, try match by parameters");
         }
 
+        var candidates = new List<MethodInfo>();
         var methods = type.GetMethods(bindingAttr);
         foreach (var item in methods)
         {
@@ -352,25 +434,19 @@ public static class Invoker
             var paramInfoCount = paramInfoList.Length;
             if (item.Name == methodName)
             {
-                if (paramInfoCount == paramStrings.Count)
+                if (paramInfoCount == paramCount)
                 {
                     //尝试匹配参数数目相同的方法
-                    if (MatchParameters(item, paramStrings, out parsedParamValues))
-                    {
-                        return item;
-                    }
+                    candidates.Add(item);
                 }
-                else if (paramInfoCount > paramStrings.Count && paramInfoList[paramStrings.Count].IsOptional)
+                else if (paramInfoCount > paramCount && paramInfoList[paramCount].IsOptional)
                 {
                     //尝试匹配有可选参数的情况
-                    if (MatchParameters(item, paramStrings, out parsedParamValues))
-                    {
-                        return item;
-                    }
+                    candidates.Add(item);
                 }
             }
         }
-        return null;
+        return candidates.ToArray();
     }
 
     /// <summary>
@@ -424,77 +500,108 @@ public static class Invoker
     /// 尝试转换参数的类型
     /// </summary>
     static bool TryConvertParamValue(string paramStr, Type targetType, out object paramVal)
+    {
+        return ResolveCache.GetConverter(targetType)(paramStr, out paramVal);
+    }
+
+    delegate bool ParamConverter(string paramStr, out object paramVal);
+
+    /// <summary>
+    /// 按目标类型选择转换方式, 结果按类型缓存
+    /// </summary>
+    static ParamConverter CreateConverter(Type targetType)
+    {
+        if (targetType.IsEnum)
+        {
+            return (string paramStr, out object paramVal) => TryConvertEnum(paramStr, targetType, out paramVal);
+        }
+        else if (targetType.IsArray)
+        {
+            var eleType = targetType.GetElementType();
+            if (eleType.IsPrimitive || eleType.IsEnum || eleType == typeof(string))
+            {
+                var eleConverter = ResolveCache.GetConverter(eleType);
+                return (string paramStr, out object paramVal) => TryConvertArray(paramStr, eleType, eleConverter, out paramVal);
+            }
+            return (string paramStr, out object paramVal) => { paramVal = null; return false; };
+        }
+        else
+        {
+            return (string paramStr, out object paramVal) => TryConvertDefault(paramStr, targetType, out paramVal);
+        }
+    }
+
+    static bool TryConvertEnum(string paramStr, Type targetType, out object paramVal)
     {
         paramVal = null;
         try
         {
-            if (targetType.IsEnum)
+            if (paramStr.IndexOf(TAG_ARG_SEP) > 0)
             {
-                if (paramStr.IndexOf(TAG_ARG_SEP) > 0)
+                int resVal = 0;
+                bool nothingParsed = true;
+                foreach (var eStr in paramStr.Split(TAG_ARG_SEP))
                 {
-                    int resVal = 0;
-                    bool nothingParsed = true;
-                    foreach (var eStr in paramStr.Split(TAG_ARG_SEP))
+                    if (Enum.IsDefined(targetType, eStr))
                     {
-                        if (Enum.IsDefined(targetType, eStr))
-                        {
-                            resVal |= Convert.ToInt32(Enum.Parse(targetType, eStr));
-                            nothingParsed = false;
-                        }
-                        else
-                        {
-                            int eVal;
-                            if (int.TryParse(eStr, out eVal) && Enum.IsDefined(targetType, eVal))
-                            {
-                                resVal |= eVal;
-                                nothingParsed = false;
-                            }
-                        }
-                    }
-                    paramVal = nothingParsed ? null : Enum.ToObject(targetType, resVal);
-                }
-                else
-                {
-                    if (Enum.IsDefined(targetType, paramStr))
-                    {
-                        paramVal = Enum.Parse(targetType, paramStr);
+                        resVal |= Convert.ToInt32(Enum.Parse(targetType, eStr));
+                        nothingParsed = false;
                     }
                     else
                     {
-                        int val;
-                        if (int.TryParse(paramStr, out val) && Enum.IsDefined(targetType, val))
+                        int eVal;
+                        if (int.TryParse(eStr, out eVal) && Enum.IsDefined(targetType, eVal))
                         {
-                            paramVal = Enum.ToObject(targetType, val);
+                            resVal |= eVal;
+                            nothingParsed = false;
                         }
                     }
                 }
+                paramVal = nothingParsed ? null : Enum.ToObject(targetType, resVal);
             }
-            else if (targetType.IsArray)
+            else
             {
-                if (paramStr.Length > 2 && paramStr[0] == TAG_ARRAY_BEG && paramStr[paramStr.Length - 1] == TAG_ARRAY_END)
+                if (Enum.IsDefined(targetType, paramStr))
+                {
+                    paramVal = Enum.Parse(targetType, paramStr);
+                }
+                else
                 {
-                    var eleStrs = paramStr.Substring(1, paramStr.Length - 2).Split(TAG_ARRAY_SEP);
-                    var eleType = targetType.GetElementType();
-                    if (eleType.IsPrimitive || eleType.IsEnum || eleType == typeof(string))
+                    int val;
+                    if (int.TryParse(paramStr, out val) && Enum.IsDefined(targetType, val))
                     {
-                        var suc = true;
-                        var arr = Array.CreateInstance(eleType, eleStrs.Length);
-                        for (int i = 0; i < eleStrs.Length && suc; i++)
-                        {
-                            object eleVal;
-                            suc &= TryConvertParamValue(eleStrs[i], eleType, out eleVal);
-                            arr.SetValue(eleVal, i);
-                        }
-                        if (suc)
-                        {
-                            paramVal = arr;
-                        }
+                        paramVal = Enum.ToObject(targetType, val);
                     }
                 }
             }
-            else
+        }
+        catch
+        {
+            return false;
+        }
+        return paramVal != null;
+    }
+
+    static bool TryConvertArray(string paramStr, Type eleType, ParamConverter eleConverter, out object paramVal)
+    {
+        paramVal = null;
+        try
+        {
+            if (paramStr.Length > 2 && paramStr[0] == TAG_ARRAY_BEG && paramStr[paramStr.Length - 1] == TAG_ARRAY_END)
             {
-                paramVal = Convert.ChangeType(paramStr, targetType);
+                var eleStrs = paramStr.Substring(1, paramStr.Length - 2).Split(TAG_ARRAY_SEP);
+                var suc = true;
+                var arr = Array.CreateInstance(eleType, eleStrs.Length);
+                for (int i = 0; i < eleStrs.Length && suc; i++)
+                {
+                    object eleVal;
+                    suc &= eleConverter(eleStrs[i], out eleVal);
+                    arr.SetValue(eleVal, i);
+                }
+                if (suc)
+                {
+                    paramVal = arr;
+                }
             }
         }
         catch
@@ -504,16 +611,193 @@ public static class Invoker
         return paramVal != null;
     }
 
+    static bool TryConvertDefault(string paramStr, Type targetType, out object paramVal)
+    {
+        paramVal = null;
+        try
+        {
+            paramVal = Convert.ChangeType(paramStr, targetType);
+        }
+        catch
+        {
+            return false;
+        }
+        return paramVal != null;
+    }
+
     static void ThrowInvokerExcpetion(string msg)
     {
         throw new Exception(string.Format("[InvokerExcpetion]   {0}", msg));
     }
 
+    /// <summary>
+    /// 类型索引和解析结果缓存, 静态字段在Domain重新加载时清空, 常驻编辑器中连续调用时复用
+    /// </summary>
+    private static class ResolveCache
+    {
+        //全部已加载类型的索引, 仅在默认程序集中找不到类型时建立
+        static Dictionary<string, List<Type>> typeIndex;
+        static readonly object indexLock = new object();
+        static readonly Dictionary<string, Type> types = new Dictionary<string, Type>();
+        static readonly Dictionary<string, MethodInfo[]> methods = new Dictionary<string, MethodInfo[]>();
+        static readonly Dictionary<Type, ParamConverter> converters = new Dictionary<Type, ParamConverter>();
+        static int typeLookups, typeHits, methodLookups, methodHits, converterLookups, converterHits;
+
+        static ResolveCache()
+        {
+            //索引建立后只需加入新加载程序集的类型
+            AppDomain.CurrentDomain.AssemblyLoad += (sender, e) =>
+            {
+                lock (indexLock)
+                {
+                    if (typeIndex != null)
+                    {
+                        AddAssembly(typeIndex, e.LoadedAssembly);
+                    }
+                }
+            };
+        }
+
+        public static bool TryGetType(string key, out Type type)
+        {
+            typeLookups++;
+            if (types.TryGetValue(key, out type))
+            {
+                typeHits++;
+                return true;
+            }
+            return false;
+        }
+
+        public static void AddType(string key, Type type)
+        {
+            types[key] = type;
+        }
+
+        public static bool TryGetMethods(string key, out MethodInfo[] candidates)
+        {
+            methodLookups++;
+            if (methods.TryGetValue(key, out candidates))
+            {
+                methodHits++;
+                return true;
+            }
+            return false;
+        }
+
+        public static void AddMethods(string key, MethodInfo[] candidates)
+        {
+            methods[key] = candidates;
+        }
+
+        public static ParamConverter GetConverter(Type targetType)
+        {
+            converterLookups++;
+            ParamConverter converter;
+            if (converters.TryGetValue(targetType, out converter))
+            {
+                converterHits++;
+                return converter;
+            }
+            converter = CreateConverter(targetType);
+            converters[targetType] = converter;
+            return converter;
+        }
+
+        /// <summary>
+        /// 在全部已加载的程序集中按优先级查找类型
+        /// </summary>
+        public static Type FindType(string typeName)
+        {
+            lock (indexLock)
+            {
+                List<Type> candidates;
+                if (Index().TryGetValue(typeName, out candidates))
+                {
+                    return candidates[0];
+                }
+            }
+            return null;
+        }
+
+        static Dictionary<string, List<Type>> Index()
+        {
+            if (typeIndex != null)
+            {
+                return typeIndex;
+            }
+
+            //默认的几个程序集优先, 与Unity编译顺序一致
+            var assemblies = new List<Assembly>(AppDomain.CurrentDomain.GetAssemblies());
+            var ordered = new List<Assembly>();
+            foreach (var name in DEFAULT_ASM_NAMES)
+            {
+                var asm = assemblies.Find(item => item.GetName().Name == name);
+                if (asm != null)
+                {
+                    ordered.Add(asm);
+                    assemblies.Remove(asm);
+                }
+            }
+            ordered.AddRange(assemblies);
+
+            var index = new Dictionary<string, List<Type>>(StringComparer.OrdinalIgnoreCase);
+            foreach (var asm in ordered)
+            {
+                AddAssembly(index, asm);
+            }
+            typeIndex = index;
+            return index;
+        }
+
+        static void AddAssembly(Dictionary<string, List<Type>> index, Assembly asm)
+        {
+            Type[] asmTypes;
+            try
+            {
+                asmTypes = asm.GetTypes();
+            }
+            catch (ReflectionTypeLoadException e)
+            {
+                asmTypes = e.Types;
+            }
+            catch (Exception)
+            {
+                return;
+            }
+            foreach (var type in asmTypes)
+            {
+                if (type == null || type.FullName == null)
+                {
+                    continue;
+                }
+                List<Type> list;
+                if (!index.TryGetValue(type.FullName, out list))
+                {
+                    list = new List<Type>(1);
+                    index.Add(type.FullName, list);
+                }
+                list.Add(type);
+            }
+        }
+
+        public static void Report()
+        {
+            Logger.WriteLine("Resolve Cache:    types {0}, methods {1}, converters {2}",
+                Rate(typeHits, typeLookups), Rate(methodHits, methodLookups), Rate(converterHits, converterLookups));
+        }
+
+        static string Rate(int hits, int lookups)
+        {
+            return string.Format("{0}/{1} ({2:P0})", hits, lookups, lookups > 0 ? (float)hits / lookups : 0f);
+        }
+    }
+
     private static class Logger
     {
         static TextWriter logWriter = TextWriter.Null;
 
-        public static void Open(string logFilePath = null)
+        public static void Open(string logFilePath = null, bool append = false)
         {
             if (string.IsNullOrEmpty(logFilePath))
             {
@@ -521,7 +805,7 @@ public static class Invoker
             }
             else
             {
-                var sw = new StreamWriter(logFilePath, false);
+                var sw = new StreamWriter(logFilePath, append);
                 sw.AutoFlush = true;
                 logWriter = sw;
             }
@@ -0,0 +1,244 @@
+﻿/**
+ *  Serve invoke requests in a long-lived editor, so chained invokes do not pay the editor startup each time
+ *
+ *  Usage:
+ *      UNITY_BUILD_UTILITY_INVOKE_TOKEN=$TOKEN $UNITY_HOME/Unity.exe -batchmode -projectPath $PROJECT_PATH \
+ *          -executeMethod InvokerServer.Start -invokePort $PORT
+ *      Do not pass -quit, the editor keeps running until a QUIT request is received.
+ *
+ *  Protocol:
+ *      Requests and responses are single lines of utf-8 text, fields are separated by tab, over tcp on 127.0.0.1:$PORT
+ *          $TOKEN PING                                    =>  OK
+ *          $TOKEN INVOKE $LOG_PATH $METHOD $PARAMETERS    =>  OK | FAIL $MESSAGE
+ *          $TOKEN QUIT                                    =>  OK
+ *      Every request starts with the token, a request with a wrong token is answered with FAIL and the connection is closed.
+ *      Use '-next' to chain the invoke, the same as Invoker.InvokeCommandLine.
+ *      Requests are executed one by one on the main thread of the editor.
+ */
+using UnityEngine;
+using UnityEditor;
+using System;
+using System.IO;
+using System.Net;
+using System.Net.Sockets;
+using System.Text;
+using System.Threading;
+using System.Collections.Generic;
+
+[InitializeOnLoad]
+public static class InvokerServer
+{
+    const string TAG_INVOKE_PORT = "-invokePort";
+    const string ENV_INVOKE_TOKEN = "UNITY_BUILD_UTILITY_INVOKE_TOKEN";
+    const string TAG_NEXT_INVOKE = "-next";
+    const char TAG_FIELD_SEP = '\t';
+
+    class Request
+    {
+        public string[] fields;
+        public string response;
+        public ManualResetEvent done = new ManualResetEvent(false);
+    }
+
+    static TcpListener listener;
+    static string token;
+    static readonly Queue<Request> requests = new Queue<Request>();
+
+    static InvokerServer()
+    {
+        //restart listening after domain reload
+        if (Array.IndexOf(Environment.GetCommandLineArgs(), TAG_INVOKE_PORT) > 0)
+        {
+            Start();
+        }
+    }
+
+    static void Start()
+    {
+        if (listener != null)
+        {
+            return;
+        }
+
+        var cmdArgs = Environment.GetCommandLineArgs();
+        var index = Array.IndexOf(cmdArgs, TAG_INVOKE_PORT);
+        int port;
+        if (index <= 0 || index + 1 >= cmdArgs.Length || !int.TryParse(cmdArgs[index + 1], out port))
+        {
+            throw new Exception(string.Format("[InvokerServer]   {0} not found in command line arguments", TAG_INVOKE_PORT));
+        }
+        //any local user can connect to the port, only the one who started the editor knows the token
+        token = Environment.GetEnvironmentVariable(ENV_INVOKE_TOKEN);
+        if (string.IsNullOrEmpty(token))
+        {
+            throw new Exception(string.Format("[InvokerServer]   {0} not found in environment variables", ENV_INVOKE_TOKEN));
+        }
+
+        listener = new TcpListener(IPAddress.Loopback, port);
+        listener.Start();
+        var thread = new Thread(Serve);
+        thread.IsBackground = true;
+        thread.Start(listener);
+
+        EditorApplication.update += Update;
+#if UNITY_2017_1_OR_NEWER
+        AssemblyReloadEvents.beforeAssemblyReload += Stop;
+#endif
+        Debug.Log(string.Format("[InvokerServer]   listening on port {0}", port));
+    }
+
+    static void Stop()
+    {
+        EditorApplication.update -= Update;
+        if (listener != null)
+        {
+            listener.Stop();
+            listener = null;
+        }
+    }
+
+    static void Serve(object state)
+    {
+        var server = (TcpListener)state;
+        while (true)
+        {
+            TcpClient client;
+            try
+            {
+                client = server.AcceptTcpClient();
+            }
+            catch (SocketException)
+            {
+                //listener stopped
+                return;
+            }
+
+            try
+            {
+                using (var stream = client.GetStream())
+                using (var reader = new StreamReader(stream, new UTF8Encoding(false)))
+                using (var writer = new StreamWriter(stream, new UTF8Encoding(false)))
+                {
+                    string line;
+                    while ((line = reader.ReadLine()) != null)
+                    {
+                        var fields = line.Split(TAG_FIELD_SEP);
+                        if (fields.Length < 2 || !Authorized(fields[0]))
+                        {
+                            writer.Write("FAIL" + TAG_FIELD_SEP + "Unauthorized request\n");
+                            writer.Flush();
+                            break;
+                        }
+                        var request = new Request();
+                        request.fields = new string[fields.Length - 1];
+                        Array.Copy(fields, 1, request.fields, 0, request.fields.Length);
+                        lock (requests)
+                        {
+                            requests.Enqueue(request);
+                        }
+                        request.done.WaitOne();
+                        writer.Write(request.response + "\n");
+                        writer.Flush();
+                    }
+                }
+            }
+            catch (IOException)
+            {
+                //client disconnected
+            }
+            finally
+            {
+                client.Close();
+            }
+        }
+    }
+
+    static bool Authorized(string requestToken)
+    {
+        //compare in constant time, do not leak the matched prefix through response time
+        if (requestToken.Length != token.Length)
+        {
+            return false;
+        }
+        var diff = 0;
+        for (int i = 0; i < token.Length; i++)
+        {
+            diff |= requestToken[i] ^ token[i];
+        }
+        return diff == 0;
+    }
+
+    static void Update()
+    {
+        while (true)
+        {
+            Request request;
+            lock (requests)
+            {
+                if (requests.Count == 0)
+                {
+                    return;
+                }
+                request = requests.Dequeue();
+            }
+
+            var quit = false;
+            try
+            {
+                request.response = Execute(request.fields, out quit);
+            }
+            catch (Exception e)
+            {
+                request.response = "FAIL" + TAG_FIELD_SEP + e.Message.Replace('\n', ' ').Replace('\r', ' ');
+            }
+            request.done.Set();
+
+            if (quit)
+            {
+                Stop();
+                EditorApplication.Exit(0);
+                return;
+            }
+        }
+    }
+
+    static string Execute(string[] fields, out bool quit)
+    {
+        quit = false;
+        switch (fields[0])
+        {
+            case "PING":
+                return "OK";
+            case "QUIT":
+                quit = true;
+                return "OK";
+            case "INVOKE":
+                if (fields.Length < 3)
+                {
+                    throw new Exception("Insufficient invoke arguments");
+                }
+                //symbol transactions do not span requests
+                Invoker.DiscardPendingSymbols();
+                var logFilePath = string.IsNullOrEmpty(fields[1]) ? null :
+                    Path.Combine(Path.GetDirectoryName(Application.dataPath), fields[1]);
+                var invokeArgs = new List<string>();
+                var appendLog = false;
+                for (int i = 2; i <= fields.Length; i++)
+                {
+                    if (i == fields.Length || fields[i] == TAG_NEXT_INVOKE)
+                    {
+                        Invoker.InvokeExplict(invokeArgs.ToArray(), logFilePath, appendLog);
+                        invokeArgs.Clear();
+                        appendLog = true;
+                    }
+                    else
+                    {
+                        invokeArgs.Add(fields[i]);
+                    }
+                }
+                return "OK";
+            default:
+                throw new Exception("Unknown request: " + fields[0]);
+        }
+    }
+}
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+'''
+benchmark the overhead of buildutil itself with stand-in executables of unity, gradle and xcodebuild
+stand-ins are python scripts, runs on linux and macOS without any real tool installed
+
+usage:
+    python bench/bench.py -sizes 100 1000 10000 -repeat 3 -out results.json
+    python bench/bench.py -out results.json -compare baseline.json
+'''
+import sys, os, time, json, shutil, argparse, tempfile, platform, plistlib, subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+STUBS_DIR = os.path.join(BENCH_DIR, 'stubs')
+
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, STUBS_DIR)
+import buildutil as utl
+import stubutil
+
+class _Bench:
+    def __init__(self, workDir, verbose):
+        self.workDir = workDir
+        self.verbose = verbose
+        self.homePath = os.path.join(workDir, 'home')
+        self.projPath = os.path.join(workDir, 'proj')
+        self.outPath = os.path.join(workDir, 'out')
+
+        #buildutil locates EditorScripts and gradlew from the directory of sys.argv[0]
+        os.makedirs(os.path.join(self.homePath, 'gradlew'))
+        shutil.copy(os.path.join(REPO_DIR, 'buildutil.py'), self.homePath)
+        shutil.copytree(os.path.join(REPO_DIR, 'EditorScripts'), os.path.join(self.homePath, 'EditorScripts'))
+        shutil.copy(os.path.join(STUBS_DIR, 'gradlew'), os.path.join(self.homePath, 'gradlew', 'gradlew'))
+        sys.argv[0] = os.path.join(self.homePath, 'buildutil.py')
+
+        for dir in ['Assets', 'Library', 'ProjectSettings']:
+            os.makedirs(os.path.join(self.projPath, dir))
+        self.provFile = os.path.join(workDir, 'bench.mobileprovision')
+        with open(self.provFile, 'wb') as f:
+            f.write(plistlib.dumps({'Name': 'bench', 'UUID': '00000000-0000-0000-0000-000000000000', 'TeamName': 'Bench',
+                                    'ProvisionsAllDevices': True,
+                                    'Entitlements': {'com.apple.developer.team-identifier': 'BENCH00000',
+                                                     'application-identifier': 'BENCH00000.com.bench.app'}}))
+
+        os.environ['PATH'] = STUBS_DIR + os.pathsep + os.environ.get('PATH', '')
+        os.environ['PYTHONPATH'] = STUBS_DIR
+        self.shared = dict(unityExe = os.path.join(STUBS_DIR, 'Unity'),
+                           unityLog = os.path.join(workDir, 'unity.log'),
+                           log = os.path.join(workDir, 'bench.log'))
+        pass
+
+    def clean(self):
+        for path in [self.outPath, os.path.join(self.workDir, 'src')]:
+            if os.path.exists(path):
+                shutil.rmtree(path)
+        pass
+
+    def runTask(self, taskName, **kwargs):
+        #return phase records, buildutil logs to stdout so it is muted unless verbose
+        stdout = sys.stdout
+        if not self.verbose:
+            sys.stdout = open(os.devnull, 'w')
+        try:
+            return utl.runTask(taskName, self.shared, **kwargs)
+        except SystemExit as e:
+            raise RuntimeError('task %s exit with code %s, see %s' %(taskName, e.code, self.shared['log']))
+        finally:
+            if not self.verbose:
+                sys.stdout.close()
+                sys.stdout = stdout
+
+    #each case prepares its input and returns (elapsed seconds, phase records)
+    def caseCopy(self, size):
+        src = os.path.join(self.workDir, 'src')
+        stubutil.makeTree(src, size)
+        start = time.time()
+        utl._copy(src, self.outPath)
+        return (time.time() - start, [])
+
+    def caseCopySync(self, size):
+        src = os.path.join(self.workDir, 'src')
+        stubutil.makeTree(src, size)
+        utl._copy(src, self.outPath)
+        start = time.time()
+        utl._copy(src, self.outPath, sync = True)
+        return (time.time() - start, [])
+
+    def caseDel(self, size):
+        stubutil.makeTree(self.outPath, size)
+        start = time.time()
+        utl._del(self.outPath)
+        return (time.time() - start, [])
+
+    def caseDelAsync(self, size):
+        #time until the caller can continue, background deletion is waited but not timed
+        stubutil.makeTree(self.outPath, size)
+        start = time.time()
+        utl._del(self.outPath, background = True)
+        elapsed = time.time() - start
+        utl._pendingDeletes.wait()
+        return (elapsed, [])
+
+    def caseInvoke(self, size):
+        start = time.time()
+        records = self.runTask(utl.INVOKE, projPath = self.projPath, calls = [['Bench.Noop']])
+        return (time.time() - start, records)
+
+    def caseInvokeDaemon(self, size):
+        #start a stand-in editor daemon, invoke through it, then stop it
+        self.runTask(utl.DAEMON, projPath = self.projPath, timeout = 30)
+        try:
+            start = time.time()
+            records = self.runTask(utl.INVOKE, projPath = self.projPath, calls = [['Bench.Noop']])
+            elapsed = time.time() - start
+        finally:
+            self.runTask(utl.DAEMON, projPath = self.projPath, timeout = 30, stop = True)
+        if 'unity.daemon' not in [record['phase'] for record in records]:
+            raise RuntimeError('invoke did not run in editor daemon')
+        return (elapsed, records)
+
+    def caseBuildExport(self, size):
+        start = time.time()
+        records = self.runTask(utl.BUILD, projPath = self.projPath, buildTarget = 'android',
+                               outPath = os.path.join(self.outPath, 'android'), exp = True)
+        return (time.time() - start, records)
+
+    def caseBundles(self, size):
+        #incremental build with 1% of bundles changed since the last build, diffed and staged
+        bundlesPath = os.path.join(self.outPath, 'bundles')
+        os.environ['BENCH_BUNDLE_CHANGES'] = str(max(1, size // 100))
+        os.environ['BENCH_BUNDLE_SEED'] = '0'
+        #stage the first build too, staged changes are diffed with the last staged build
+        stagePath = os.path.join(self.outPath, 'stage')
+        self.runTask(utl.BUNDLES, projPath = self.projPath, buildTarget = 'android', outPath = bundlesPath, stage = stagePath)
+        os.environ['BENCH_BUNDLE_SEED'] = '1'
+        start = time.time()
+        records = self.runTask(utl.BUNDLES, projPath = self.projPath, buildTarget = 'android', outPath = bundlesPath,
+                               stage = stagePath)
+        return (time.time() - start, records)
+
+    def casePackAndroid(self, size):
+        exportPath = os.path.join(self.outPath, 'android')
+        stubutil.makeTree(exportPath, size)
+        with open(os.path.join(exportPath, 'build.gradle'), 'w') as f:
+            f.write('//bench\n')
+        start = time.time()
+        records = self.runTask(utl.PACK_ANDROID, projPath = exportPath, task = ['assembleRelease'])
+        return (time.time() - start, records)
+
+    def casePackiOS(self, size):
+        exportPath = os.path.join(self.outPath, 'ios')
+        stubutil.makeTree(exportPath, size)
+        start = time.time()
+        records = self.runTask(utl.PACK_IOS, projPath = exportPath, provFile = [self.provFile],
+                               archiveFile = os.path.join(self.outPath, 'ios.xcarchive'))
+        return (time.time() - start, records)
+    pass
+
+CASES = [('copy', _Bench.caseCopy),
+         ('copy.sync', _Bench.caseCopySync),
+         ('del', _Bench.caseDel),
+         ('del.async', _Bench.caseDelAsync),
+         ('invoke', _Bench.caseInvoke),
+         ('invoke.daemon', _Bench.caseInvokeDaemon),
+         ('build.export', _Bench.caseBuildExport),
+         ('bundles', _Bench.caseBundles),
+         ('packandroid', _Bench.casePackAndroid),
+         ('packios', _Bench.casePackiOS)]
+
+def _phaseTimes(records):
+    phases = {}
+    for record in records:
+        phases[record['phase']] = phases.get(record['phase'], 0) + record.get('time', 0)
+    return phases
+
+def _version():
+    try:
+        return subprocess.check_output(['git', 'describe', '--always', '--dirty'], cwd = REPO_DIR,
+                                       stderr = subprocess.DEVNULL).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _compare(results, baselineFile, threshold):
+    #return number of regressions, which median time exceeds baseline by threshold
+    with open(baselineFile) as f:
+        baseline = dict(((r['case'], r['size']), r) for r in json.load(f)['results'])
+    regressions = 0
+    print('')
+    print('%-16s %8s %12s %12s %8s' %('case', 'size', 'baseline', 'current', 'ratio'))
+    for result in results:
+        base = baseline.get((result['case'], result['size']))
+        if not base or 'median' not in base or 'median' not in result:
+            continue
+        ratio = result['median'] / base['median'] if base['median'] else 1.0
+        regressed = ratio > 1 + threshold
+        regressions += 1 if regressed else 0
+        print('%-16s %8s %11.4fs %11.4fs %7.2fx%s' %(result['case'], result['size'], base['median'], result['median'],
+                                                    ratio, ' REGRESSION' if regressed else ''))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description = 'benchmark buildutil with stand-in executables')
+    parser.add_argument('-sizes', nargs = '+', type = int, default = [100, 1000, 10000], help = 'number of files of generated trees')
+    parser.add_argument('-fileSize', type = int, default = 4096, help = 'size of each generated file in bytes')
+    parser.add_argument('-logLines', type = int, default = 1000, help = 'number of log lines printed by stand-ins for each step')
+    parser.add_argument('-repeat', type = int, default = 3, help = 'run each case for times, median and min are reported')
+    parser.add_argument('-cases', nargs = '+', choices = [name for name, func in CASES], help = 'cases to run, all by default')
+    parser.add_argument('-out', help = 'save results as json')
+    parser.add_argument('-compare', help = 'compare with results json of another version, exit with 1 on regression')
+    parser.add_argument('-threshold', type = float, default = 0.2, help = 'ratio over baseline median reported as regression')
+    parser.add_argument('-workDir', help = 'work directory, a temporary directory by default')
+    parser.add_argument('-verbose', action = 'store_true', help = 'show buildutil output')
+    args = parser.parse_args()
+
+    workDir = os.path.abspath(args.workDir) if args.workDir else tempfile.mkdtemp(prefix = 'buildutil-bench-')
+    if os.path.exists(workDir):
+        shutil.rmtree(workDir)
+    os.makedirs(workDir)
+    os.environ['BENCH_FILE_SIZE'] = str(args.fileSize)
+    os.environ['BENCH_LOG_LINES'] = str(args.logLines)
+
+    results = []
+    try:
+        bench = _Bench(workDir, args.verbose)
+        for name, func in CASES:
+            if args.cases and name not in args.cases:
+                continue
+            for size in args.sizes:
+                os.environ['BENCH_FILES'] = str(size)
+                result = {'case': name, 'size': size, 'times': []}
+                try:
+                    for i in range(args.repeat):
+                        elapsed, records = func(bench, size)
+                        result['times'].append(elapsed)
+                        result['phases'] = _phaseTimes(records)
+                        bench.clean()
+                    times = sorted(result['times'])
+                    result['min'] = times[0]
+                    result['median'] = times[len(times) // 2]
+                    print('%-16s %8s files  median %.4fs  min %.4fs' %(name, size, result['median'], result['min']))
+                except Exception as e:
+                    result['error'] = str(e)
+                    print('%-16s %8s files  failed: %s' %(name, size, e))
+                    bench.clean()
+                results.append(result)
+    finally:
+        shutil.rmtree(workDir, ignore_errors = True)
+
+    output = {'version': _version(), 'date': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+              'platform': platform.platform(), 'cpus': os.cpu_count(),
+              'config': {'sizes': args.sizes, 'fileSize': args.fileSize, 'logLines': args.logLines, 'repeat': args.repeat},
+              'results': results}
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(output, f, indent = 2)
+        print('results saved to: %s' %args.out)
+    if args.compare and _compare(results, args.compare, args.threshold) > 0:
+        return 1
+    return 1 if any('error' in r for r in results) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,54 @@
+'''
+shared helpers of the stand-in executables, output size is configured by environment variables:
+BENCH_FILES         number of files in generated output trees, 100 by default
+BENCH_FILE_SIZE     size of each generated file in bytes, 4096 by default
+BENCH_LOG_LINES     number of log lines printed by each step, 1000 by default
+'''
+import os, sys
+
+def config(name, default):
+    return int(os.environ.get(name, default))
+
+def files():
+    return config('BENCH_FILES', 100)
+
+def fileSize():
+    return config('BENCH_FILE_SIZE', 4096)
+
+def logLines():
+    return config('BENCH_LOG_LINES', 1000)
+
+def value(args, key, default = None):
+    return args[args.index(key) + 1] if key in args else default
+
+def makeTree(root, count = None, size = None):
+    #spread files over sub directories like a real exported project, 64 files each
+    count = files() if count == None else count
+    size = fileSize() if size == None else size
+    data = b'x' * size
+    for i in range(count):
+        dir = os.path.join(root, 'dir%03d' %(i // 64))
+        if not os.path.exists(dir):
+            os.makedirs(dir)
+        with open(os.path.join(dir, 'file%05d.bin' %i), 'wb') as f:
+            f.write(data)
+    pass
+
+def makeFile(path, size):
+    dir = os.path.dirname(path)
+    if dir and not os.path.exists(dir):
+        os.makedirs(dir)
+    with open(path, 'wb') as f:
+        remain = size
+        chunk = b'x' * min(size, 1024 * 1024)
+        while remain > 0:
+            f.write(chunk[:remain])
+            remain -= len(chunk)
+    pass
+
+def printLines(fmt, count = None, out = None):
+    out = out if out else sys.stdout
+    for i in range(logLines() if count == None else count):
+        out.write(fmt %i + '\n')
+    out.flush()
+    pass
@@ -7,7 +7,7 @@ author:     Qu Yong <work.qu@outlook.com>
 version:    0.5.0
 '''
 
-import os, sys, shutil, datetime, argparse, subprocess, plistlib
+import os, sys, shutil, datetime, argparse, subprocess, plistlib, hashlib, json, time, re, logging, logging.handlers
 
 #util methods
 class _BuildTarget:
@@ -50,25 +50,138 @@ class _BuildOptions:
         return buildOpts.find(_BuildOptions.AcceptExternalModificationsToPlayer) >= 0
     pass
 
-def _initLogging(homePath, logFile, logFileMode):
-    import logging
-    logger = logging.getLogger()
-    for hd in logger.handlers:
-        hd.close()
-    del logger.handlers[:]
-    logger.setLevel(logging.INFO)
-    logger.addHandler(logging.StreamHandler(sys.stdout))
+class _BufferedFileHandler(logging.handlers.RotatingFileHandler):
+    #emit flushes after every record, leave it to the buffer and the idle listener instead.
+    #a file opened with a mode may be shared by concurrent processes, flush per record there so lines do not interleave
+    def __init__(self, filename, mode, maxBytes, backupCount):
+        logging.handlers.RotatingFileHandler.__init__(self, filename, mode, maxBytes, backupCount)
+        self.buffered = mode == 'w'
+        pass
+
+    def flush(self):
+        if not self.buffered:
+            self.sync()
+        pass
+
+    def sync(self):
+        self.acquire()
+        try:
+            if self.stream:
+                self.stream.flush()
+        finally:
+            self.release()
+        pass
+    pass
+
+class _ConsoleHandler(logging.StreamHandler):
+    #write to current sys.stdout, which may be replaced between runs
+    def __init__(self):
+        logging.Handler.__init__(self)
+        pass
+
+    @property
+    def stream(self):
+        return sys.stdout
+    pass
+
+class _LogListener(logging.handlers.QueueListener):
+    def dequeue(self, block):
+        #write out buffered records when no record arrives for a while
+        import queue
+        try:
+            return self.queue.get(block, _LogPipeline.FlushInterval)
+        except queue.Empty:
+            for handler in self.handlers:
+                if isinstance(handler, _BufferedFileHandler):
+                    handler.sync()
+            return self.queue.get(block)
+    pass
+
+class _LogPipeline:
+    '''
+    logging is set up once per process, records are queued by the calling thread and written to stdout and log file by a listener thread.
+    after stop, handlers are attached to the root logger directly, so records logged at exit are still written.
+    rotation is single-process only, processes appending to the same log file must not set a rotation size
+    '''
+    FlushInterval = 1.0
+    BackupCount = 5
+
+    def __init__(self):
+        import queue
+        self.__queue = queue.Queue()
+        self.__console = _ConsoleHandler()
+        self.__file = None
+        self.__fileKey = None
+        self.__listener = None
+        self.__registered = False
+        pass
+
+    def configure(self, logFile, logFileMode, maxBytes):
+        #the log file is reopened only when its path or rotation size changes, or it is truncated with w mode
+        self.stop()
+        fileKey = (logFile, maxBytes or 0) if logFile else None
+        if self.__file and (fileKey != self.__fileKey or logFileMode or self.__file.stream == None):
+            self.__file.close()
+            self.__file = None
+        if fileKey and not self.__file:
+            self.__file = _BufferedFileHandler(logFile, 'w' if logFileMode else 'a', maxBytes or 0, _LogPipeline.BackupCount)
+        self.__fileKey = fileKey
+        self.start()
+        pass
+
+    def start(self):
+        handlers = [self.__console] + ([self.__file] if self.__file else [])
+        self.__listener = _LogListener(self.__queue, *handlers)
+        self.__listener.start()
+        self.__attach(logging.handlers.QueueHandler(self.__queue))
+        if not self.__registered:
+            import atexit
+            atexit.register(self.stop)
+            self.__registered = True
+        pass
+
+    def stop(self):
+        #write out all queued records and fall back to synchronous handlers
+        if self.__listener:
+            self.__listener.stop()
+            self.__listener = None
+        self.flush()
+        self.__attach(self.__console, *([self.__file] if self.__file else []))
+        pass
+
+    def flush(self):
+        if self.__listener:
+            self.__queue.join()
+        if self.__file:
+            self.__file.sync()
+        pass
+
+    def __attach(self, *handlers):
+        logger = logging.getLogger()
+        for hd in logger.handlers:
+            if isinstance(hd, logging.handlers.QueueHandler):
+                hd.close()
+        del logger.handlers[:]
+        logger.setLevel(logging.INFO)
+        for hd in handlers:
+            logger.addHandler(hd)
+        pass
+    pass
+
+_logPipeline = _LogPipeline()
+
+def _initLogging(homePath, logFile, logFileMode, logMaxSize = None):
+    _logPipeline.configure(logFile, logFileMode, int(logMaxSize * 1024 * 1024) if logMaxSize else 0)
     if logFile:
-        logger.addHandler(logging.FileHandler(logFile, 'w' if logFileMode else 'a'))
         _logInfo('===Initializing===')
         _logInfo('datetime:  %s' %datetime.datetime.now())
         _logInfo('logFile:   %s' %logFile)
     pass
 
 def _logInfo(msg, exitWithCode = None):
-    import logging
     logging.info(msg)
     if exitWithCode != None:
+        _logPipeline.stop()
         logging.shutdown()
         sys.exit(exitWithCode)
     pass
@@ -76,6 +189,290 @@ def _logInfo(msg, exitWithCode = None):
 def _fullPath(path):
     return os.path.abspath(os.path.expanduser(path)) if path else None
 
+class _Report:
+    #records are buffered and appended to report file in batches, and at exit of each run with flush
+    FlushRecords = 500
+    FlushInterval = 5.0
+    #latest records kept in memory for the caller of runTask, the report file has all of them
+    MaxRecords = 10000
+
+    def __init__(self, reportFile = None):
+        import threading, collections
+        self.__lock = threading.Lock()
+        self.__reportFile = reportFile
+        self.__pending = []
+        self.__lastWrite = time.time()
+        self.records = collections.deque(maxlen = _Report.MaxRecords)
+        pass
+
+    def add(self, record):
+        with self.__lock:
+            self.records.append(record)
+            if self.__reportFile:
+                self.__pending.append(record)
+                if len(self.__pending) >= _Report.FlushRecords or time.time() - self.__lastWrite >= _Report.FlushInterval:
+                    self.__write()
+        pass
+
+    def flush(self):
+        with self.__lock:
+            self.__write()
+        pass
+
+    def __write(self):
+        if self.__pending:
+            with open(self.__reportFile, 'a') as f:
+                f.write(''.join(json.dumps(record) + '\n' for record in self.__pending))
+            self.__pending = []
+        self.__lastWrite = time.time()
+        pass
+    pass
+
+#phase records of current run, written to -report file as ndjson
+_report = _Report()
+
+class _Phase:
+    def __init__(self, name, **fields):
+        self.name = name
+        self.fields = fields
+        pass
+
+    def __enter__(self):
+        self.__start = time.time()
+        return self
+
+    def __exit__(self, excType, excValue, tb):
+        record = {'phase': self.name, 'start': self.__start, 'time': time.time() - self.__start, 'ok': excType == None}
+        record.update(self.fields)
+        _report.add(record)
+        return False
+    pass
+
+#per phase timeout in seconds, phase 'xcodebuild' also applies to 'xcodebuild.archive'
+_phaseTimeouts = {}
+
+def _phaseTimeout(phase):
+    while phase:
+        if phase in _phaseTimeouts:
+            return _phaseTimeouts[phase]
+        phase = phase.rpartition('.')[0]
+    return None
+
+def _killTree(pid):
+    #kill child process and all its descendants, children are started in their own session on posix
+    try:
+        import psutil
+        try:
+            root = psutil.Process(pid)
+            for proc in root.children(recursive = True) + [root]:
+                try:
+                    proc.kill()
+                except psutil.Error:
+                    pass
+        except psutil.Error:
+            pass
+        return
+    except ImportError:
+        pass
+    if sys.platform.startswith('win32'):
+        subprocess.call(['taskkill', '/F', '/T', '/PID', str(pid)], stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL)
+    else:
+        import signal
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except OSError:
+            pass
+    pass
+
+class _ProcessHandle:
+    def __init__(self, proc, grace = None):
+        self.pid = proc.pid
+        self.proc = proc
+        self.grace = grace
+        self.killed = False
+        pass
+
+    def kill(self):
+        #safe to call from any thread, never blocks.
+        #with grace, the process gets SIGTERM to kill its own children in other sessions, and is killed after grace seconds
+        self.killed = True
+        if not self.grace or sys.platform.startswith('win32'):
+            _killTree(self.pid)
+            return
+        import signal, threading
+        try:
+            os.killpg(self.pid, signal.SIGTERM)
+        except OSError:
+            pass
+        timer = threading.Timer(self.grace, lambda: self.proc.returncode == None and _killTree(self.pid))
+        timer.daemon = True
+        timer.start()
+        pass
+    pass
+
+#handles of running child processes, killed on SIGTERM since they are not in our process group
+_liveProcesses = set()
+_terminateHandled = False
+_terminated = None
+
+def _onTerminate(signum, frame):
+    global _terminated
+    _terminated = signum
+    if not _liveProcesses:
+        sys.exit(128 + signum)
+    #killed children are reaped by their waiters, which then exit
+    for handle in list(_liveProcesses):
+        handle.kill()
+    pass
+
+def _handleTerminate():
+    #signal handlers can only be installed from main thread
+    import signal, threading
+    global _terminateHandled
+    if _terminateHandled or threading.current_thread() is not threading.main_thread():
+        return
+    if signal.getsignal(signal.SIGTERM) == signal.SIG_DFL:
+        signal.signal(signal.SIGTERM, _onTerminate)
+    _terminateHandled = True
+    pass
+
+class _ProcessUsage:
+    #cpu time and peak rss of the process tree, sampled with psutil when available,
+    #otherwise resource usage of reaped children, which is approximate when processes run concurrently
+    Interval = 0.5
+
+    def __init__(self):
+        self.__cpu = {}
+        self.__peakRss = 0
+        self.__sampled = False
+        self.__before = None
+        try:
+            import resource
+            self.__before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        except ImportError:
+            pass
+        pass
+
+    async def sample(self, pid):
+        import asyncio
+        try:
+            import psutil
+            root = psutil.Process(pid)
+        except Exception:
+            return
+        self.__sampled = True
+        while True:
+            rss = 0
+            try:
+                procs = [root] + root.children(recursive = True)
+            except psutil.Error:
+                procs = []
+            for proc in procs:
+                try:
+                    times = proc.cpu_times()
+                    self.__cpu[proc.pid] = times.user + times.system
+                    rss += proc.memory_info().rss
+                except psutil.Error:
+                    pass
+            self.__peakRss = max(self.__peakRss, rss)
+            await asyncio.sleep(_ProcessUsage.Interval)
+
+    def fields(self):
+        if self.__sampled:
+            return {'cpuTime': sum(self.__cpu.values()), 'peakRss': self.__peakRss}
+        if self.__before:
+            import resource
+            after = resource.getrusage(resource.RUSAGE_CHILDREN)
+            fields = {'cpuTime': (after.ru_utime + after.ru_stime) - (self.__before.ru_utime + self.__before.ru_stime)}
+            if after.ru_maxrss > self.__before.ru_maxrss:
+                #ru_maxrss is in bytes on macOS and in kilobytes on linux
+                fields['peakRss'] = after.ru_maxrss * (1 if sys.platform.startswith('darwin') else 1024)
+            return fields
+        return {}
+    pass
+
+async def _callAsync(argList, phase, onStart = None, timeout = None, onLine = None, echo = True, tag = None, grace = None, **kwargs):
+    '''
+    run child process and return its exit code, stdout and stderr are streamed line by line unless redirected by kwargs
+    onStart:    called with _ProcessHandle after the process started
+    timeout:    seconds before the process tree is killed, _phaseTimeouts by default
+    onLine:     called with each output line
+    echo:       log output lines, prefixed with [tag] when tag is specified
+    grace:      seconds between SIGTERM and kill, for children which clean up their own process trees
+    '''
+    import asyncio
+    timeout = timeout if timeout else _phaseTimeout(phase)
+    with _Phase(phase, cmd = os.path.basename(argList[0])) as ph:
+        pipe = 'stdout' not in kwargs
+        if pipe:
+            kwargs.update(stdout = subprocess.PIPE, stderr = subprocess.PIPE)
+        if not sys.platform.startswith('win32'):
+            kwargs.setdefault('start_new_session', True)
+
+        usage = _ProcessUsage()
+        proc = await asyncio.create_subprocess_exec(*argList, limit = 1024 * 1024, **kwargs)
+        handle = _ProcessHandle(proc, grace)
+        _liveProcesses.add(handle)
+
+        async def readLines(stream):
+            while True:
+                try:
+                    line = await stream.readline()
+                except ValueError:
+                    #line longer than limit
+                    line = await stream.read(1024 * 1024)
+                if not line:
+                    break
+                text = line.decode('utf-8', 'replace').rstrip('\r\n')
+                if echo:
+                    _logInfo('[%s] %s' %(tag, text) if tag else text)
+                if onLine:
+                    onLine(text)
+
+        readers = [asyncio.ensure_future(readLines(proc.stdout)), asyncio.ensure_future(readLines(proc.stderr))] if pipe else []
+        sampler = asyncio.ensure_future(usage.sample(proc.pid))
+        try:
+            if onStart:
+                onStart(handle)
+            try:
+                await asyncio.wait_for(proc.wait(), timeout)
+            except asyncio.TimeoutError:
+                _logInfo('%s timeout after %ss, kill process tree: %s' %(phase, timeout, proc.pid))
+                ph.fields['timeout'] = timeout
+                handle.kill()
+                await proc.wait()
+            if readers:
+                #descendants may hold the pipes after the process exited, do not wait for them forever
+                done, pending = await asyncio.wait(readers, timeout = 5)
+                for reader in pending:
+                    reader.cancel()
+            if _terminated:
+                _logInfo('%s terminated by signal %s' %(phase, _terminated))
+                sys.exit(128 + _terminated)
+        except BaseException:
+            #interrupted or cancelled, children are in their own session and will not receive the signal
+            if proc.returncode == None:
+                handle.kill()
+            raise
+        finally:
+            _liveProcesses.discard(handle)
+            sampler.cancel()
+            for reader in readers:
+                reader.cancel()
+        ph.fields.update(usage.fields())
+        ph.fields['code'] = proc.returncode
+        return proc.returncode
+
+def _runAsync(*coros):
+    #run coroutines concurrently in a new event loop and return their results, safe to use in any thread
+    import asyncio
+    async def gather():
+        return await asyncio.gather(*coros)
+    return asyncio.run(gather())
+
+def _call(argList, phase, onStart = None, **kwargs):
+    return _runAsync(_callAsync(argList, phase, onStart, **kwargs))[0]
+
 def _correctExt(outPath, buildTarget, buildOpts):
     root, ext = os.path.splitext(outPath)
     noexp = buildOpts.find(_BuildOptions.AcceptExternalModificationsToPlayer) < 0
@@ -92,60 +489,673 @@ def _correctExt(outPath, buildTarget, buildOpts):
         return root + ext
     pass
 
-def _copy(src, dst, append = False, stat = False):
+#max worker threads for file operations, set by -jobs
+_fileJobs = min(32, (os.cpu_count() or 1) + 4)
+
+class _CopyStats:
+    def __init__(self):
+        import threading
+        self.__lock = threading.Lock()
+        self.copiedFiles = 0
+        self.copiedBytes = 0
+        self.skippedFiles = 0
+        self.skippedBytes = 0
+        self.deletedFiles = 0
+        self.deletedBytes = 0
+        pass
+
+    def add(self, kind, files, size):
+        with self.__lock:
+            setattr(self, kind + 'Files', getattr(self, kind + 'Files') + files)
+            setattr(self, kind + 'Bytes', getattr(self, kind + 'Bytes') + size)
+        pass
+
+    def log(self):
+        _logInfo('copied:  %s files, %s bytes' %(self.copiedFiles, self.copiedBytes))
+        _logInfo('skipped: %s files, %s bytes' %(self.skippedFiles, self.skippedBytes))
+        _logInfo('deleted: %s files, %s bytes' %(self.deletedFiles, self.deletedBytes))
+        pass
+    pass
+
+def _hashFile(path):
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+def _copy(src, dst, append = False, stat = False, jobs = None, sync = False, checksum = False, prune = False):
+    '''
+    sync:       only copy files which size and mtime (or content with checksum) differ from dst, implies append
+    prune:      delete files in dst which are not exist in src, only take effect with sync
+    '''
+    with _Phase('copy', src = src, dst = dst) as phase:
+        stats = _copyPaths(src, dst, append, stat, jobs, sync, checksum, prune)
+        phase.fields.update(files = stats.copiedFiles, bytes = stats.copiedBytes)
+        return stats
+
+def _copyPaths(src, dst, append, stat, jobs, sync, checksum, prune):
     if src == dst or src == None or not os.path.exists(src):
         _logInfo('copy failed, %s >> %s' %(src, dst), 1)
 
+    stats = _CopyStats()
     if os.path.isdir(src):
-        #src and dst are dirs
-        if os.path.exists(dst):
-            if os.path.isfile(dst):
-                os.remove(dst)
-            elif os.path.isdir(dst):
-                if not append:
-                    shutil.rmtree(dst)
-                    os.makedirs(dst)
+        #src and dst are dirs, collect files with a single walk then copy them in parallel
+        files = []
+        _copyTree(src, dst, append or sync, sync and prune, files, stats)
+        jobs = jobs or _fileJobs
+        copyFile = lambda item: _copyFile(item[0], item[1], stat, sync, checksum, stats)
+        if jobs > 1 and len(files) > 1:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers = jobs) as pool:
+                for _ in pool.map(copyFile, files):
+                    pass
         else:
-            os.makedirs(dst)
-        
-        for item in os.listdir(src):
-            srcPath = os.path.join(src, item)
-            dstPath = os.path.join(dst, item)
-            _copy(srcPath, dstPath, append, stat)
+            for item in files:
+                copyFile(item)
     elif os.path.isfile(src):
         #src and dst are files
-        if os.path.exists(dst):
-            _del(dst)
+        dstDir = os.path.dirname(dst)
+        if not os.path.exists(dstDir):
+            os.makedirs(dstDir)
+        _copyFile(src, dst, stat, sync, checksum, stats)
+    else:
+        _logInfo('path is not a file or directory: %s' %src)
+    return stats
+
+def _copyTree(src, dst, append, prune, files, stats):
+    if os.path.exists(dst):
+        if os.path.isfile(dst):
+            os.remove(dst)
+            os.makedirs(dst)
+        elif os.path.isdir(dst):
+            if not append:
+                shutil.rmtree(dst)
+                os.makedirs(dst)
+    else:
+        os.makedirs(dst)
+
+    names = set()
+    for entry in os.scandir(src):
+        names.add(entry.name)
+        dstPath = os.path.join(dst, entry.name)
+        if entry.is_dir():
+            _copyTree(entry.path, dstPath, append, prune, files, stats)
+        elif entry.is_file():
+            files.append((entry.path, dstPath))
         else:
-            dstDir = os.path.dirname(dst)
-            if not os.path.exists(dstDir):
-                os.makedirs(dstDir)
+            _logInfo('path is not a file or directory: %s' %entry.path)
+
+    if prune:
+        for entry in os.scandir(dst):
+            if entry.name not in names:
+                if entry.is_dir(follow_symlinks = False):
+                    for dirPath, dirNames, fileNames in os.walk(entry.path):
+                        for name in fileNames:
+                            stats.add('deleted', 1, os.path.getsize(os.path.join(dirPath, name)))
+                else:
+                    stats.add('deleted', 1, entry.stat(follow_symlinks = False).st_size)
+                _del(entry.path)
+    pass
 
+def _copyFile(src, dst, stat, sync, checksum, stats):
+    srcStat = os.stat(src)
+    if sync and _sameFile(srcStat, src, dst, checksum):
+        stats.add('skipped', 1, srcStat.st_size)
+        return
+
+    if os.path.islink(dst) or os.path.isdir(dst):
+        _del(dst)
+    elif os.path.exists(dst) and os.stat(dst).st_nlink > 1:
+        #writing in place goes through hardlinks, e.g. files fetched from artifact store
+        os.remove(dst)
+    try:
+        shutil.copyfile(src, dst)
+    except (IOError, OSError):
+        #overwrite read-only files
+        if not os.path.exists(dst):
+            raise
+        _del(dst)
         shutil.copyfile(src, dst)
-        if stat:
-            shutil.copystat(src, dst)
+    if stat:
+        shutil.copystat(src, dst)
+    elif sync:
+        #keep mtime for comparison in next sync
+        os.utime(dst, (srcStat.st_atime, srcStat.st_mtime))
+    stats.add('copied', 1, srcStat.st_size)
+    pass
+
+def _sameFile(srcStat, src, dst, checksum):
+    if os.path.islink(dst) or not os.path.isfile(dst):
+        return False
+    dstStat = os.stat(dst)
+    if srcStat.st_size != dstStat.st_size:
+        return False
+    if checksum:
+        return _hashFile(src) == _hashFile(dst)
+    return int(srcStat.st_mtime) == int(dstStat.st_mtime)
+
+class _Transfer:
+    Rename = 'rename'
+    Hardlink = 'hardlink'
+    Reflink = 'reflink'
+    Copy = 'copy'
+
+    All = [Rename, Hardlink, Reflink, Copy]
+
+    #FICLONE ioctl request code on linux
+    _FICLONE = 0x40049409
+
+    @staticmethod
+    def file(src, dst, strategies):
+        #dst will be replaced, src is kept
+        if os.path.lexists(dst):
+            _del(dst)
+        for strategy in strategies:
+            if strategy == _Transfer.Rename:
+                continue
+            try:
+                if strategy == _Transfer.Hardlink:
+                    os.link(src, dst)
+                    return strategy
+                elif strategy == _Transfer.Reflink:
+                    if _Transfer.__reflink(src, dst):
+                        shutil.copystat(src, dst)
+                        return strategy
+                elif strategy == _Transfer.Copy:
+                    _Transfer.__copyfile(src, dst)
+                    shutil.copystat(src, dst)
+                    return strategy
+            except (IOError, OSError):
+                if os.path.lexists(dst):
+                    os.remove(dst)
+        raise OSError('transfer failed with strategies %s, %s >> %s' %(strategies, src, dst))
+
+    @staticmethod
+    def __reflink(src, dst):
+        if sys.platform.startswith('linux'):
+            import fcntl
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                fcntl.ioctl(fdst.fileno(), _Transfer._FICLONE, fsrc.fileno())
+            return True
+        elif sys.platform.startswith('darwin'):
+            import ctypes, ctypes.util
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno = True)
+            if libc.clonefile(src.encode('utf-8'), dst.encode('utf-8'), 0) == 0:
+                return True
+            raise OSError(ctypes.get_errno(), 'clonefile failed')
+        return False
+
+    @staticmethod
+    def __copyfile(src, dst):
+        if hasattr(os, 'copy_file_range'):
+            #in-kernel copy, may share extents on filesystems with reflink support
+            try:
+                with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                    while os.copy_file_range(fsrc.fileno(), fdst.fileno(), 1 << 30) > 0:
+                        pass
+                return
+            except OSError:
+                pass
+        shutil.copyfile(src, dst)
+    pass
+
+#strategies tried in order when moving files, set by -transfer
+_transferStrategies = _Transfer.All
+
+def _move(src, dst, strategies = None):
+    strategies = strategies or _transferStrategies
+    if src == dst or src == None or not os.path.exists(src):
+        _logInfo('move failed, %s >> %s' %(src, dst), 1)
+
+    srcIsDir = os.path.isdir(src) and not os.path.islink(src)
+    if _Transfer.Rename in strategies:
+        if os.path.lexists(dst) and not (srcIsDir and os.path.isdir(dst)):
+            _del(dst)
+        if not os.path.lexists(dst):
+            dstDir = os.path.dirname(dst)
+            if dstDir and not os.path.exists(dstDir):
+                os.makedirs(dstDir)
+            try:
+                os.rename(src, dst)
+                return
+            except OSError:
+                pass
+
+    if srcIsDir:
+        #merge into existing dst dir, or rename failed across devices
+        if os.path.lexists(dst) and not os.path.isdir(dst):
+            _del(dst)
+        if not os.path.exists(dst):
+            os.makedirs(dst)
+        for entry in os.scandir(src):
+            _move(entry.path, os.path.join(dst, entry.name), strategies)
+        os.rmdir(src)
     else:
-        _logInfo('path is not a file or directory: %s' %src)
+        dstDir = os.path.dirname(dst)
+        if dstDir and not os.path.exists(dstDir):
+            os.makedirs(dstDir)
+        _Transfer.file(src, dst, strategies)
+        os.remove(src)
     pass
 
-def _del(path, alsoDelSuffixes = None):
-    if os.path.isfile(path):
-        os.remove(path)
-    elif os.path.isdir(path):
-        shutil.rmtree(path)
-    elif os.path.exists(path):
-        _logInfo('path is not a file or directory: %s' %path)
+def _del(path, alsoDelSuffixes = None, background = False):
+    '''
+    background:     rename directory to a tombstone and delete it in background, use _pendingDeletes.wait() to wait for it
+    '''
+    if os.path.lexists(path):
+        with _Phase('del', path = path, background = background):
+            #remove the link itself, never the directory it points to
+            if os.path.islink(path) or os.path.isfile(path):
+                os.remove(path)
+            elif os.path.isdir(path):
+                _pendingDeletes.sweep(os.path.dirname(path))
+                if not background or not _pendingDeletes.submit(path):
+                    shutil.rmtree(path)
+            else:
+                _logInfo('path is not a file or directory: %s' %path)
 
     if alsoDelSuffixes:
         for suffix in alsoDelSuffixes:
-            _del(path + suffix)
+            _del(path + suffix, background = background)
+    pass
+
+def _pidAlive(pid):
+    #unknown is treated as alive
+    try:
+        import psutil
+        return psutil.pid_exists(pid)
+    except ImportError:
+        pass
+    if sys.platform.startswith('win32'):
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+class _PendingDeletes:
+    TombstoneTag = '.deleting-'
+
+    def __init__(self):
+        import threading
+        self.__lock = threading.Lock()
+        self.__threads = []
+        self.__count = 0
+        self.files = 0
+        self.errors = 0
+        pass
+
+    def submit(self, path):
+        #return False if path can not be renamed, e.g. files in use on windows
+        with self.__lock:
+            self.__count += 1
+            tombstone = os.path.join(os.path.dirname(path), '.%s%s%s-%s' %(os.path.basename(path), _PendingDeletes.TombstoneTag, os.getpid(), self.__count))
+        try:
+            os.rename(path, tombstone)
+        except OSError:
+            return False
+        self.__start(tombstone)
+        return True
+
+    def sweep(self, dir):
+        #delete tombstones left behind by killed runs, tombstones of running processes are kept
+        try:
+            names = os.listdir(dir or '.')
+        except OSError:
+            return
+        for name in names:
+            tag = name.rfind(_PendingDeletes.TombstoneTag)
+            if not name.startswith('.') or tag < 0:
+                continue
+            pid = name[tag + len(_PendingDeletes.TombstoneTag):].partition('-')[0]
+            if not pid.isdigit() or int(pid) == os.getpid() or _pidAlive(int(pid)):
+                continue
+            tombstone = os.path.join(dir, name)
+            if os.path.isdir(tombstone) and not os.path.islink(tombstone):
+                _logInfo('delete stale tombstone: %s' %tombstone)
+                self.__start(tombstone)
+        pass
+
+    def __start(self, tombstone):
+        import threading
+        #non-daemon thread, interpreter waits for it before exit
+        thread = threading.Thread(target = self.__rmtree, args = (tombstone,))
+        thread.start()
+        with self.__lock:
+            self.__threads.append((tombstone, thread))
+        pass
+
+    def wait(self):
+        with self.__lock:
+            threads = self.__threads
+            self.__threads = []
+        if not threads:
+            return
+        with _Phase('del.wait', count = len(threads)) as ph:
+            start = time.time()
+            for tombstone, thread in threads:
+                thread.join()
+            ph.fields.update(files = self.files, errors = self.errors)
+        _logInfo('waited %.2fs for %s pending deletes, %s files deleted, %s errors' %(time.time() - start, len(threads), self.files, self.errors))
+        pass
+
+    def __rmtree(self, root):
+        #clear directories level by level in parallel, then remove the empty directories bottom up
+        from concurrent.futures import ThreadPoolExecutor
+        dirs = [root]
+        with ThreadPoolExecutor(max_workers = _fileJobs) as pool:
+            level = [root]
+            while level:
+                level = [subDir for subDirs in pool.map(self.__clear, level) for subDir in subDirs]
+                dirs.extend(level)
+        for dir in reversed(dirs):
+            try:
+                os.rmdir(dir)
+            except OSError:
+                self.__error(dir)
+        pass
+
+    def __clear(self, dir):
+        subDirs = []
+        files = 0
+        try:
+            entries = list(os.scandir(dir))
+        except OSError:
+            self.__error(dir)
+            return subDirs
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks = False):
+                    subDirs.append(entry.path)
+                else:
+                    os.remove(entry.path)
+                    files += 1
+            except OSError:
+                self.__error(entry.path)
+        with self.__lock:
+            self.files += files
+        return subDirs
+
+    def __error(self, path):
+        with self.__lock:
+            self.errors += 1
+        _logInfo('delete failed: %s' %path)
+    pass
+
+_pendingDeletes = _PendingDeletes()
+
+class _ZipWriter:
+    #deflate chunks in parallel and write them to zip in order, chunks of a file are joined with sync flush like pigz
+    ChunkSize = 4 * 1024 * 1024
+
+    def __init__(self, zipFile, jobs, level = 6):
+        import zipfile
+        self.zipfile = zipfile
+        self.zf = zipfile.ZipFile(zipFile, 'w', zipfile.ZIP_DEFLATED, allowZip64 = True)
+        self.jobs = jobs
+        self.level = level
+        self.inBytes = 0
+        pass
+
+    def write(self, src):
+        from concurrent.futures import ThreadPoolExecutor
+        import collections
+        pending = collections.deque()
+        with ThreadPoolExecutor(max_workers = self.jobs) as pool:
+            for item in self.__chunks(src):
+                if item[0] == 'chunk':
+                    item = ('chunk', pool.submit(self.__deflate, item[1], item[2]))
+                pending.append(item)
+                #bound memory by number of chunks in flight
+                while len(pending) > self.jobs * 2:
+                    self.__emit(pending.popleft())
+            while pending:
+                self.__emit(pending.popleft())
+        self.zf.close()
+        pass
+
+    def __chunks(self, src):
+        import zlib, stat
+        root = os.path.dirname(src)
+        for path in self.__walk(src):
+            arcname = os.path.relpath(path, root).replace(os.sep, '/')
+            zinfo = self.zipfile.ZipInfo.from_file(path, arcname)
+            if os.path.islink(path):
+                #store link target as content, the same as info-zip
+                zinfo.external_attr = (stat.S_IFLNK | 0o777) << 16
+                yield ('link', zinfo, os.readlink(path).encode('utf-8'))
+            elif zinfo.is_dir():
+                yield ('dir', zinfo)
+            else:
+                yield ('begin', zinfo)
+                crc = 0
+                with open(path, 'rb') as f:
+                    chunk = f.read(_ZipWriter.ChunkSize)
+                    while True:
+                        nextChunk = f.read(_ZipWriter.ChunkSize) if chunk else b''
+                        crc = zlib.crc32(chunk, crc)
+                        self.inBytes += len(chunk)
+                        yield ('chunk', chunk, not nextChunk)
+                        if not nextChunk:
+                            break
+                        chunk = nextChunk
+                yield ('end', zinfo, crc)
+
+    def __walk(self, src):
+        yield src
+        if os.path.isdir(src) and not os.path.islink(src):
+            for dirPath, dirNames, fileNames in os.walk(src):
+                dirNames.sort()
+                for name in dirNames:
+                    path = os.path.join(dirPath, name)
+                    if os.path.islink(path):
+                        yield path
+                for name in sorted(fileNames):
+                    yield os.path.join(dirPath, name)
+                for name in dirNames:
+                    path = os.path.join(dirPath, name)
+                    if not os.path.islink(path):
+                        yield path
+
+    def __deflate(self, data, last):
+        import zlib
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+        return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+    def __emit(self, item):
+        zf = self.zf
+        kind = item[0]
+        if kind == 'dir':
+            zf.writestr(item[1], b'')
+        elif kind == 'link':
+            item[1].compress_type = self.zipfile.ZIP_STORED
+            zf.writestr(item[1], item[2])
+        elif kind == 'begin':
+            #write a placeholder header and rewrite it when sizes and crc are known, the same as zipfile does
+            zinfo = item[1]
+            zinfo.compress_type = self.zipfile.ZIP_DEFLATED
+            zinfo.compress_size = 0
+            zinfo.CRC = 0
+            zinfo.header_offset = zf.fp.tell()
+            self.__zip64 = zinfo.file_size * 1.05 > self.zipfile.ZIP64_LIMIT
+            zf.fp.write(zinfo.FileHeader(self.__zip64))
+            self.__dataStart = zf.fp.tell()
+        elif kind == 'chunk':
+            zf.fp.write(item[1].result())
+        elif kind == 'end':
+            zinfo = item[1]
+            end = zf.fp.tell()
+            zinfo.CRC = item[2]
+            zinfo.compress_size = end - self.__dataStart
+            zf.fp.seek(zinfo.header_offset)
+            zf.fp.write(zinfo.FileHeader(self.__zip64))
+            zf.fp.seek(end)
+            zf.filelist.append(zinfo)
+            zf.NameToInfo[zinfo.filename] = zinfo
+            zf.start_dir = end
+            zf._didModify = True
+        pass
+    pass
+
+def _archive(src, dstFile, jobs = None):
+    #stream file or directory into a compressed archive using multiple cores, format by extension:
+    #.zip       parallel deflate
+    #.tar.zst   multithreaded zstd, requires zstandard module
+    if not os.path.exists(src):
+        _logInfo('archive source not exist: %s' %src, 1)
+    jobs = jobs if jobs else (os.cpu_count() or 1)
+    dir = os.path.dirname(dstFile)
+    if dir and not os.path.exists(dir):
+        os.makedirs(dir)
+    if os.path.lexists(dstFile):
+        _del(dstFile)
+
+    with _Phase('archive', src = src, dst = dstFile) as ph:
+        start = time.time()
+        if dstFile.endswith('.tar.zst'):
+            try:
+                import zstandard
+            except ImportError:
+                _logInfo('zstandard module is required for .tar.zst archive, install with: pip install zstandard', 1)
+            import tarfile
+
+            sizes = []
+            def count(tarinfo):
+                sizes.append(tarinfo.size)
+                return tarinfo
+
+            cctx = zstandard.ZstdCompressor(level = 3, threads = jobs)
+            with open(dstFile, 'wb') as f:
+                with cctx.stream_writer(f) as writer:
+                    with tarfile.open(fileobj = writer, mode = 'w|') as tar:
+                        tar.add(src, arcname = os.path.basename(src), filter = count)
+            inBytes = sum(sizes)
+        elif dstFile.endswith('.zip'):
+            writer = _ZipWriter(dstFile, jobs)
+            writer.write(src)
+            inBytes = writer.inBytes
+        else:
+            _logInfo('unsupported archive format: %s, .zip or .tar.zst is expected' %dstFile, 1)
+
+        elapsed = max(time.time() - start, 0.001)
+        outBytes = os.path.getsize(dstFile)
+        ratio = float(outBytes) / inBytes if inBytes else 1.0
+        throughput = inBytes / elapsed / (1024 * 1024)
+        ph.fields.update(inBytes = inBytes, outBytes = outBytes, ratio = ratio, throughput = throughput)
+    _logInfo('archive: %s bytes >> %s bytes, ratio %.3f, %.1f MB/s in %.2fs with %s jobs' %(inBytes, outBytes, ratio, throughput, elapsed, jobs))
+    pass
+
+def _isArchiveFile(path):
+    return path.endswith('.zip') or path.endswith('.tar.zst')
+
+class _UnityLogParser:
+    #(event type, pattern) of unity editor log lines
+    Patterns = [
+        ('error', re.compile(r'^(?P<file>[^(]+)\((?P<line>\d+),(?P<column>\d+)\): error (?P<code>CS\d+): (?P<message>.*)$')),
+        ('fatal', re.compile(r'^(?P<message>Scripts have compiler errors\.|Aborting batchmode due to failure:.*|executeMethod class .* could not be found\.)')),
+        ('import', re.compile(r'^Start importing (?P<path>.+?) using Guid')),
+        ('step', re.compile(r'^DisplayProgressbar: (?P<step>.+)$')),
+        ('result', re.compile(r'^Build Finished, Result: (?P<result>\w+)')),
+    ]
+
+    def __init__(self):
+        self.counts = {}
+        self.__errors = set()
+        pass
+
+    def feed(self, line):
+        for eventType, pattern in _UnityLogParser.Patterns:
+            match = pattern.match(line)
+            if match:
+                event = match.groupdict()
+                if eventType == 'error':
+                    #unity prints compile errors again in compilation summary
+                    key = (event['file'], event['line'], event['code'])
+                    if key in self.__errors:
+                        return None
+                    self.__errors.add(key)
+                event['event'] = eventType
+                event['text'] = line
+                self.counts[eventType] = self.counts.get(eventType, 0) + 1
+                return event
+        return None
+    pass
+
+class _UnityLogTail:
+    def __init__(self, logFile, onEvent):
+        import threading
+        self.__logFile = logFile
+        self.__onEvent = onEvent
+        self.__stop = threading.Event()
+        self.__thread = threading.Thread(target = self.__run)
+        self.__thread.daemon = True
+        self.parser = _UnityLogParser()
+        pass
+
+    def start(self):
+        self.__thread.start()
+        pass
+
+    def stop(self):
+        self.__stop.set()
+        self.__thread.join()
+        pass
+
+    def __run(self):
+        pos = 0
+        pending = b''
+        while True:
+            stopping = self.__stop.is_set()
+            try:
+                size = os.path.getsize(self.__logFile)
+            except OSError:
+                size = pos
+            if size < pos:
+                #log file recreated
+                pos = 0
+                pending = b''
+            if size > pos:
+                with open(self.__logFile, 'rb') as f:
+                    f.seek(pos)
+                    for data in iter(lambda: f.read(1024 * 1024), b''):
+                        pos += len(data)
+                        lines = (pending + data).split(b'\n')
+                        pending = lines.pop()
+                        for line in lines:
+                            self.__feed(line)
+            if stopping:
+                if pending:
+                    self.__feed(pending)
+                break
+            self.__stop.wait(0.5)
+        pass
+
+    def __feed(self, line):
+        event = self.parser.feed(line.decode('utf-8', 'replace').rstrip('\r'))
+        if event:
+            self.__onEvent(event)
+        pass
     pass
 
 class _Invoker:
+    EditorScripts = ['BuildUtility.cs', 'Invoker.cs', 'InvokerServer.cs']
+    ScriptsDir = 'Assets/_UnityBuildUtility'
+    InvokeLogFile = 'Library/LastInvoke.log'
+    LogChunkSize = 64 * 1024
+    BeginTag = '---------Invoke Begin---------'
+    ExceptionTag = '---------Exception Occured---------'
+
     def __init__(self, methodName, argList):
         self.__invokeList = ['-executeMethod', 'Invoker.InvokeCommandLine', methodName]
         self.__invokeList.extend(argList)
-        self.__invokeLogFile = 'Library/LastInvoke.log'
+        self.__invokeLogFile = _Invoker.InvokeLogFile
+        self.invokeLog = None
+        #keep content of invoke log in invokeLog, otherwise it is only copied into build util log
+        self.keepInvokeLog = False
         pass
 
     def append(self, methodName, argList):
@@ -154,6 +1164,23 @@ class _Invoker:
         self.__invokeList.extend(argList)
         return self
 
+    @staticmethod
+    def unityArgs(projPath, args, quit):
+        argList = [args.unityExe]
+        if args.unityLog:
+            argList.extend(['-logFile', args.unityLog])
+        if args.buildTarget:
+            argList.extend(['-buildTarget', args.buildTarget])
+        if not args.nobatch:
+            argList.append('-batchmode')
+        if quit:
+            argList.append('-quit')
+        if args.unityExtraArgs:
+            argList.extend(args.unityExtraArgs.split(' '))
+        if projPath:
+            argList.extend(['-projectPath', projPath])
+        return argList
+
     def invoke(self, projPath, args):
         homePath = args.homePath
         unityExe = args.unityExe
@@ -163,20 +1190,7 @@ class _Invoker:
         quit = not args.noquit
         unityExtraArgs = args.unityExtraArgs
 
-        argList = [unityExe]
-        if unityLog:
-            argList.extend(['-logFile', unityLog])
-        if buildTarget:
-            argList.extend(['-buildTarget', buildTarget])
-        if batchmode:
-            argList.append('-batchmode')
-        if quit:
-            argList.append('-quit')
-        if unityExtraArgs:
-            argList.extend(unityExtraArgs.split(' '))
-        if projPath:
-            argList.extend(['-projectPath', projPath])
-
+        argList = _Invoker.unityArgs(projPath, args, quit)
         argList.extend(['-invokeLog', self.__invokeLogFile])
         argList.extend(self.__invokeList)
 
@@ -194,98 +1208,963 @@ class _Invoker:
         _logInfo('')
         
         if os.path.isdir(projPath):
+            daemon = _Daemon.connect(projPath)
+            if daemon:
+                return self.__invokeDaemon(daemon, projPath, args)
+
+            libTarget = _LibraryCache.target(buildTarget) if args.libcache and buildTarget else None
             try:
-                self._setup(projPath, homePath)
+                if libTarget:
+                    with _Phase('invoke.libcache'):
+                        _LibraryCache.swap(projPath, libTarget)
+                with _Phase('invoke.setup') as ph:
+                    installed = _Invoker.setup(projPath, homePath, args.install)
+                    if installed != None:
+                        ph.fields['installed'] = installed
                 _logInfo(' '.join(argList))
-                ret = subprocess.call(argList)
+                ret = self.__call(argList, args)
+                if libTarget and ret == 0:
+                    _LibraryCache.save(projPath, libTarget)
                 if ret != 0:
                     _logInfo('execute failed with code: %s' %ret, ret)
                 return ret
             finally:
-                self._cleanup(projPath)
+                with _Phase('invoke.cleanup'):
+                    self.invokeLog = _Invoker.cleanup(projPath, args.cleanup, self.keepInvokeLog)
         else:
             _logInfo('projectPath not exist: %s' %projPath, 1)
         pass
-         
-    def _setup(self, projPath, homePath):
+
+    def __call(self, argList, args):
+        if not args.unityLog:
+            return _call(argList, 'unity')
+
+        #tail unity log while the editor is running
+        state = {'proc': None, 'killed': False, 'imports': 0}
+        def onEvent(event):
+            eventType = event['event']
+            if eventType == 'import':
+                state['imports'] += 1
+                if state['imports'] %500 == 0:
+                    _logInfo('[unity] %s assets imported' %state['imports'])
+                return
+            _logInfo('[unity] %s: %s' %(eventType, event['text']))
+            record = dict(event, phase = 'unity.log', start = time.time())
+            _report.add(record)
+            if args.failfast and eventType in ['error', 'fatal'] and not state['killed']:
+                state['killed'] = True
+                _logInfo('[unity] kill editor on fatal error')
+                state['proc'].kill()
+
+        tail = _UnityLogTail(args.unityLog, onEvent)
+        def onStart(proc):
+            state['proc'] = proc
+            tail.start()
+
+        _del(args.unityLog)
+        try:
+            ret = _call(argList, 'unity', onStart)
+        finally:
+            tail.stop()
+        counts = tail.parser.counts
+        _logInfo('[unity] log summary: %s errors, %s assets imported, %s build steps' %(
+            counts.get('error', 0), counts.get('import', 0), counts.get('step', 0)))
+        if state['killed'] and ret == 0:
+            ret = 1
+        return ret
+
+    def __invokeDaemon(self, daemon, projPath, args):
+        _logInfo('invoke with running editor daemon on port: %s' %daemon.port)
+        if args.buildTarget:
+            _logInfo('buildTarget is ignored by running editor daemon: %s' %args.buildTarget)
+        try:
+            #a busy editor never answers, always wait with a limit. -timeouts unity= also applies here
+            timeout = _phaseTimeout('unity.daemon') or _Daemon.InvokeTimeout
+            with _Phase('unity.daemon', timeout = timeout):
+                ret = daemon.invoke(self.__invokeLogFile, self.__invokeList[2:], timeout)
+        finally:
+            self.invokeLog = _Invoker.logInvokeLog(projPath, self.keepInvokeLog)
+        if ret != 0:
+            _logInfo('execute failed with code: %s' %ret, ret)
+        return ret
+
+    @staticmethod
+    def setup(projPath, homePath, install = False):
+        #an installed package is kept up to date and always preferred, scripts must not exist twice
+        if install or os.path.isdir(os.path.join(projPath, _EditorPackage.PackageDir)):
+            _del(os.path.join(projPath, _Invoker.ScriptsDir), ['.meta'])
+            return _EditorPackage.install(projPath, homePath)
+
         #try avoid path conflict with prefix
-        _copy(os.path.join(homePath, 'EditorScripts/BuildUtility.cs'),
-              os.path.join(projPath, 'Assets/_UnityBuildUtility/Editor/BuildUtility.cs'))
-        _copy(os.path.join(homePath, 'EditorScripts/Invoker.cs'),
-              os.path.join(projPath, 'Assets/_UnityBuildUtility/Editor/Invoker.cs'))
+        for script in _Invoker.EditorScripts:
+            _copy(os.path.join(homePath, 'EditorScripts', script),
+                  os.path.join(projPath, _Invoker.ScriptsDir, 'Editor', script))
+        return None
+
+    @staticmethod
+    def cleanup(projPath, uninstall = False, keep = False):
+        _del(os.path.join(projPath, _Invoker.ScriptsDir), ['.meta'])
+        if uninstall:
+            _EditorPackage.uninstall(projPath)
+        return _Invoker.logInvokeLog(projPath, keep)
+
+    @staticmethod
+    def logInvokeLog(projPath, keep = False):
+        #copy invoke log into build util log in chunks split at line ends, content is returned only when kept
+        logFilePath = os.path.join(projPath, _Invoker.InvokeLogFile)
+        chunks = [] if keep else None
+        if os.path.exists(logFilePath):
+            try:
+                with open(logFilePath, encoding = 'utf-8', errors = 'replace') as f:
+                    _logInfo('')
+                    rest = ''
+                    while True:
+                        data = f.read(_Invoker.LogChunkSize)
+                        if not data:
+                            break
+                        if keep:
+                            chunks.append(data)
+                        data = rest + data
+                        end = data.rfind('\n')
+                        if end >= 0:
+                            _logInfo(data[:end])
+                            rest = data[end + 1:]
+                        elif len(data) >= _Invoker.LogChunkSize:
+                            #a single line longer than chunk size
+                            _logInfo(data)
+                            rest = ''
+                        else:
+                            rest = data
+                    if rest:
+                        _logInfo(rest)
+            finally:
+                _del(logFilePath)
+        return ''.join(chunks) if keep else None
+
+    @staticmethod
+    def splitInvokeLog(content):
+        sections = (content or '').split(_Invoker.BeginTag)[1:]
+        return [_Invoker.BeginTag + section for section in sections]
+    pass
+
+class _LibraryCache:
+    #Library snapshots are kept as Library.{target} beside Library, marker file records the target of current Library
+    TargetFile = '_UnityBuildUtility.target'
+
+    @staticmethod
+    def target(buildTarget):
+        return _BuildTarget._switch.get(buildTarget.lower(), buildTarget)
+
+    @staticmethod
+    def swap(projPath, target):
+        libPath = os.path.join(projPath, 'Library')
+        markerFile = os.path.join(libPath, _LibraryCache.TargetFile)
+        current = None
+        if os.path.isfile(markerFile):
+            with open(markerFile) as f:
+                current = f.read().strip()
+        if current == target:
+            _logInfo('Library is ready for target: %s' %target)
+            return
+
+        snapshot = libPath + '.' + target
+        parked = libPath + '.' + (current or 'Unknown')
+        if os.path.isdir(snapshot):
+            if os.path.isdir(libPath):
+                _del(parked)
+                os.rename(libPath, parked)
+                _logInfo('Library of target %s saved as: %s' %(current, parked))
+            os.rename(snapshot, libPath)
+            _logInfo('Library snapshot swapped in: %s' %snapshot)
+        elif current and os.path.isdir(libPath):
+            #keep a clone of current target as its snapshot, unity switches platform in place on the Library.
+            #never hardlink, unity writes files of Library in place
+            _del(parked)
+            with _Phase('libcache.clone', src = libPath, dst = parked) as ph:
+                ph.fields['files'] = _LibraryCache.clone(libPath, parked)
+            _logInfo('Library of target %s saved as: %s, no snapshot for target: %s' %(current, parked, target))
+        else:
+            _logInfo('no Library snapshot for target: %s' %target)
+        _del(markerFile)
+        pass
+
+    @staticmethod
+    def clone(src, dst):
+        #reflink each file when supported, otherwise copy, return number of files
+        files = []
+        for dirPath, dirNames, fileNames in os.walk(src):
+            dstDir = os.path.join(dst, os.path.relpath(dirPath, src))
+            os.makedirs(dstDir, exist_ok = True)
+            for name in dirNames + fileNames:
+                srcPath = os.path.join(dirPath, name)
+                if os.path.islink(srcPath):
+                    os.symlink(os.readlink(srcPath), os.path.join(dstDir, name))
+                elif name in fileNames:
+                    files.append((srcPath, os.path.join(dstDir, name)))
+            dirNames[:] = [name for name in dirNames if not os.path.islink(os.path.join(dirPath, name))]
+        strategies = [_Transfer.Reflink, _Transfer.Copy]
+        transfer = lambda item: _Transfer.file(item[0], item[1], strategies)
+        if _fileJobs > 1 and len(files) > 1:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers = _fileJobs) as pool:
+                for _ in pool.map(transfer, files):
+                    pass
+        else:
+            for item in files:
+                transfer(item)
+        return len(files)
+
+    @staticmethod
+    def save(projPath, target):
+        libPath = os.path.join(projPath, 'Library')
+        if os.path.isdir(libPath):
+            with open(os.path.join(libPath, _LibraryCache.TargetFile), 'w') as f:
+                f.write(target)
+            _logInfo('Library saved for target: %s' %target)
+        pass
+    pass
+
+class _EditorPackage:
+    '''
+    editor scripts installed once as an embedded package with its own assembly definition, requires unity 2018.1 or newer
+    unity only recompiles the package when the scripts change, which is detected by the version stamp
+    '''
+    PackageName = 'com.unitybuildutility.editor'
+    PackageDir = 'Packages/com.unitybuildutility.editor'
+    AssemblyName = 'UnityBuildUtility.Editor'
+    StampFile = '.stamp'
+
+    @staticmethod
+    def files(homePath):
+        #relative path to content of each file in the package
+        files = {}
+        for script in _Invoker.EditorScripts:
+            with open(os.path.join(homePath, 'EditorScripts', script), 'rb') as f:
+                files['Editor/' + script] = f.read()
+        manifest = {'name': _EditorPackage.PackageName, 'displayName': 'Unity Build Utility', 'version': '1.0.0',
+                    'unity': '2018.1', 'description': 'editor scripts of buildutil.py'}
+        asmdef = {'name': _EditorPackage.AssemblyName, 'includePlatforms': ['Editor']}
+        files['package.json'] = json.dumps(manifest, indent = 2).encode('utf-8')
+        files['Editor/%s.asmdef' %_EditorPackage.AssemblyName] = json.dumps(asmdef, indent = 2).encode('utf-8')
+        return files
+
+    @staticmethod
+    def stamp(files):
+        sha1 = hashlib.sha1()
+        for relPath in sorted(files):
+            sha1.update(relPath.encode('utf-8'))
+            sha1.update(hashlib.sha1(files[relPath]).digest())
+        return sha1.hexdigest()
+
+    @staticmethod
+    def installed(projPath):
+        stampFile = os.path.join(projPath, _EditorPackage.PackageDir, _EditorPackage.StampFile)
+        if not os.path.isfile(stampFile):
+            return None
+        with open(stampFile) as f:
+            return f.read().strip()
+
+    @staticmethod
+    def install(projPath, homePath):
+        files = _EditorPackage.files(homePath)
+        stamp = _EditorPackage.stamp(files)
+        if _EditorPackage.installed(projPath) == stamp:
+            _logInfo('editor package up to date: %s' %stamp)
+            return False
+
+        #rewrite only changed files, meta files generated by unity are kept
+        pkgPath = os.path.join(projPath, _EditorPackage.PackageDir)
+        for relPath, content in files.items():
+            filePath = os.path.join(pkgPath, relPath)
+            if os.path.isfile(filePath):
+                with open(filePath, 'rb') as f:
+                    if f.read() == content:
+                        continue
+            if not os.path.exists(os.path.dirname(filePath)):
+                os.makedirs(os.path.dirname(filePath))
+            with open(filePath, 'wb') as f:
+                f.write(content)
+        with open(os.path.join(pkgPath, _EditorPackage.StampFile), 'w') as f:
+            f.write(stamp)
+        _logInfo('editor package installed: %s' %stamp)
+        return True
+
+    @staticmethod
+    def uninstall(projPath):
+        pkgPath = os.path.join(projPath, _EditorPackage.PackageDir)
+        if os.path.exists(pkgPath):
+            _del(pkgPath)
+            _logInfo('editor package removed: %s' %pkgPath)
+        pass
+    pass
+
+class _Daemon:
+    StateFile = 'Library/_UnityBuildUtility.daemon'
+    #the editor reads the token from environment, command line arguments are visible to other users
+    TokenEnv = 'UNITY_BUILD_UTILITY_INVOKE_TOKEN'
+    #seconds to wait for an invoke request without -timeouts unity=
+    InvokeTimeout = 3 * 3600
+
+    def __init__(self, projPath, port, pid, token):
+        self.projPath = projPath
+        self.port = port
+        self.pid = pid
+        self.token = token
+        pass
+
+    @staticmethod
+    def connect(projPath):
+        stateFile = os.path.join(projPath, _Daemon.StateFile)
+        if not os.path.isfile(stateFile):
+            return None
+        try:
+            with open(stateFile) as f:
+                state = json.load(f)
+            daemon = _Daemon(projPath, state['port'], state['pid'], state['token'])
+        except (IOError, OSError, ValueError, KeyError):
+            return None
+        if daemon.ping():
+            return daemon
+        _logInfo('editor daemon not responding, ignore state file: %s' %stateFile)
+        _del(stateFile)
+        return None
+
+    @staticmethod
+    def start(projPath, args):
+        import socket, secrets
+        port = args.port
+        if not port:
+            sock = socket.socket()
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+            sock.close()
+
+        argList = _Invoker.unityArgs(projPath, args, False)
+        argList.extend(['-executeMethod', 'InvokerServer.Start', '-invokePort', str(port)])
+
+        #every request carries the token, other local users can connect to the port but can not read the state file
+        token = secrets.token_hex(16)
+        env = dict(os.environ)
+        env[_Daemon.TokenEnv] = token
+
+        #detach from current process, the editor keeps running after buildutil exits
+        kwargs = {'env': env}
+        if args.winOS:
+            kwargs['creationflags'] = 0x00000008 | 0x00000200 #DETACHED_PROCESS | CREATE_NEW_PROCESS_GROUP
+        else:
+            kwargs['start_new_session'] = True
+
+        _Invoker.setup(projPath, args.homePath, args.install)
+        _logInfo(' '.join(argList))
+        proc = subprocess.Popen(argList, stdin = subprocess.DEVNULL, stdout = subprocess.DEVNULL,
+                                stderr = subprocess.DEVNULL, **kwargs)
+        daemon = _Daemon(projPath, port, proc.pid, token)
+        deadline = time.time() + args.timeout
+        while time.time() < deadline:
+            ret = proc.poll()
+            if ret != None:
+                _Invoker.cleanup(projPath)
+                _logInfo('editor daemon exited with code: %s' %ret, ret or 1)
+            if daemon.ping():
+                stateFile = os.path.join(projPath, _Daemon.StateFile)
+                if not os.path.exists(os.path.dirname(stateFile)):
+                    os.makedirs(os.path.dirname(stateFile))
+                fd = os.open(stateFile, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                os.chmod(stateFile, 0o600)
+                with os.fdopen(fd, 'w') as f:
+                    json.dump({'port': port, 'pid': proc.pid, 'token': token}, f)
+                _logInfo('editor daemon started, pid: %s, port: %s' %(proc.pid, port))
+                return daemon
+            time.sleep(1)
+
+        proc.kill()
+        proc.wait()
+        _Invoker.cleanup(projPath)
+        _logInfo('editor daemon not responding after %s seconds' %args.timeout, 1)
+        pass
+
+    def stop(self, timeout):
+        try:
+            self.request(['QUIT'], timeout)
+        except (IOError, OSError):
+            pass
+
+        deadline = time.time() + timeout
+        while time.time() < deadline and self.__alive():
+            time.sleep(1)
+        _del(os.path.join(self.projPath, _Daemon.StateFile))
+        _Invoker.cleanup(self.projPath)
+        _logInfo('editor daemon stopped, pid: %s' %self.pid)
+        pass
+
+    def ping(self):
+        try:
+            return self.request(['PING'], 5) == ['OK']
+        except (IOError, OSError):
+            return False
+
+    def invoke(self, logFile, invokeArgs, timeout):
+        import socket
+        try:
+            fields = self.request(['INVOKE', logFile] + [str(arg) for arg in invokeArgs], timeout)
+        except socket.timeout:
+            _logInfo('editor daemon did not respond in %s seconds, it may be hung or reloading, stop it with: daemon -stop' %timeout)
+            return 1
+        if fields[0] == 'OK':
+            return 0
+        _logInfo('editor daemon invoke failed: %s' %' '.join(fields[1:]))
+        return 1
+
+    def request(self, fields, timeout = None):
+        import socket
+        sock = socket.create_connection(('127.0.0.1', self.port), timeout or 5)
+        try:
+            sock.settimeout(timeout)
+            sock.sendall(('\t'.join([self.token] + fields) + '\n').encode('utf-8'))
+            data = b''
+            while not data.endswith(b'\n'):
+                chunk = sock.recv(4096)
+                if not chunk:
+                    raise IOError('connection closed by editor daemon')
+                data += chunk
+        finally:
+            sock.close()
+        return data.decode('utf-8').rstrip('\r\n').split('\t')
+
+    def __alive(self):
+        if sys.platform.startswith('win32'):
+            return self.ping()
+        try:
+            #reap the editor if it is started by current process
+            if os.waitpid(self.pid, os.WNOHANG)[0] == self.pid:
+                return False
+        except OSError:
+            pass
+        try:
+            os.kill(self.pid, 0)
+            return True
+        except OSError:
+            return False
+    pass
+
+class _BuildCache:
+    #sub directories of unity project that affect the build output
+    InputDirs = ['Assets', 'ProjectSettings', 'Packages']
+    #injected editor scripts, not part of the project inputs
+    IgnorePrefixes = [_Invoker.ScriptsDir, _EditorPackage.PackageDir]
+    MaxEntries = 8
+
+    def __init__(self, cacheDir):
+        self.__cacheDir = cacheDir
+        self.__hashesFile = os.path.join(cacheDir, 'hashes.json')
+        pass
+
+    def key(self, projPath, buildTarget, buildOpts, *extras):
+        sha = hashlib.sha1()
+        for item in [buildTarget, buildOpts] + [str(e) for e in extras]:
+            sha.update(item.encode('utf-8'))
+            sha.update(b'\0')
+        sha.update(self.__fingerprint(projPath).encode('utf-8'))
+        return sha.hexdigest()
+
+    def restore(self, key, outputs):
+        entryDir = os.path.join(self.__cacheDir, key)
+        entry = self.__loadJson(os.path.join(entryDir, 'entry.json'))
+        if not entry or len(entry.get('outputs', [])) != len(outputs):
+            _logInfo('build cache miss: %s' %key)
+            return False
+
+        start = time.time()
+        for i, out in enumerate(outputs):
+            _del(out)
+            cached = os.path.join(entryDir, str(i))
+            if os.path.exists(cached):
+                _copy(cached, out, stat = True)
+        elapsed = time.time() - start
+        os.utime(os.path.join(entryDir, 'entry.json'), None)
+        _logInfo('build cache hit: %s, restored in %.2fs, saved %.2fs' %(key, elapsed, max(0, entry.get('time', 0) - elapsed)))
+        return True
+
+    def store(self, key, outputs, buildTime):
+        entryDir = os.path.join(self.__cacheDir, key)
+        _del(entryDir)
+        os.makedirs(entryDir)
+        for i, out in enumerate(outputs):
+            if os.path.exists(out):
+                _copy(out, os.path.join(entryDir, str(i)), stat = True)
+        #write entry file at last, incomplete entries are treated as cache miss
+        self.__saveJson(os.path.join(entryDir, 'entry.json'),
+                        {'outputs': [os.path.basename(out) for out in outputs], 'time': buildTime})
+        _logInfo('build cache stored: %s' %key)
+        self.__evict()
+        pass
+
+    def __evict(self):
+        entries = []
+        for item in os.listdir(self.__cacheDir):
+            entryFile = os.path.join(self.__cacheDir, item, 'entry.json')
+            if os.path.isfile(entryFile):
+                entries.append((os.path.getmtime(entryFile), item))
+        entries.sort(reverse = True)
+        for mtime, item in entries[_BuildCache.MaxEntries:]:
+            _logInfo('build cache evict: %s' %item)
+            _del(os.path.join(self.__cacheDir, item))
+        pass
+
+    def __fingerprint(self, projPath):
+        #content hashes are memorized by size and mtime to avoid re-reading unchanged files
+        lastHashes = self.__loadJson(self.__hashesFile) or {}
+        hashes = {}
+        sha = hashlib.sha1()
+        for inputDir in _BuildCache.InputDirs:
+            root = os.path.join(projPath, inputDir)
+            for dirPath, dirNames, fileNames in os.walk(root):
+                dirNames.sort()
+                for name in sorted(fileNames):
+                    path = os.path.join(dirPath, name)
+                    relPath = os.path.relpath(path, projPath).replace(os.sep, '/')
+                    if any(relPath.startswith(p) for p in _BuildCache.IgnorePrefixes):
+                        continue
+                    st = os.stat(path)
+                    last = lastHashes.get(relPath)
+                    if last and last[0] == st.st_size and last[1] == st.st_mtime:
+                        digest = last[2]
+                    else:
+                        digest = _hashFile(path)
+                    hashes[relPath] = [st.st_size, st.st_mtime, digest]
+                    sha.update(('%s:%s\n' %(relPath, digest)).encode('utf-8'))
+        self.__saveJson(self.__hashesFile, hashes)
+        return sha.hexdigest()
+
+    @staticmethod
+    def __loadJson(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def __saveJson(self, path, obj):
+        if not os.path.exists(self.__cacheDir):
+            os.makedirs(self.__cacheDir)
+        with open(path, 'w') as f:
+            json.dump(obj, f)
+    pass
+
+class _ArtifactStore:
+    #objects are whole files named by content hash, shared by all artifacts which contain the same content
+    #fetched files are hardlinks of objects where possible, objects are read-only and must not be modified in place
+    DefaultBudget = 20
+    #unreferenced objects younger than this are being published by another process, not swept
+    GracePeriod = 3600
+
+    def __init__(self, storeDir, budget = None):
+        self.__storeDir = storeDir
+        self.__objectsDir = os.path.join(storeDir, 'objects')
+        self.__indexFile = os.path.join(storeDir, 'index.json')
+        self.__budget = int((budget if budget else _ArtifactStore.DefaultBudget) * 1024 * 1024 * 1024)
+        if not os.path.exists(self.__objectsDir):
+            os.makedirs(self.__objectsDir)
+        pass
+
+    def publish(self, path, **meta):
+        #return artifact id, identical artifacts published again share the same id
+        stats = _CopyStats()
+        files = {}
+        links = {}
+        sources = {}
+        if os.path.isdir(path):
+            for dirPath, dirNames, fileNames in os.walk(path):
+                for name in dirNames + fileNames:
+                    itemPath = os.path.join(dirPath, name)
+                    relPath = os.path.relpath(itemPath, path).replace(os.sep, '/')
+                    if os.path.islink(itemPath):
+                        links[relPath] = os.readlink(itemPath)
+                    elif os.path.isfile(itemPath):
+                        files[relPath] = self.__ingest(itemPath, stats)
+                        sources[relPath] = itemPath
+        else:
+            files[''] = self.__ingest(path, stats)
+            sources[''] = path
+
+        manifest = {'kind': 'dir' if os.path.isdir(path) else 'file', 'files': files, 'links': links}
+        artifactId = hashlib.sha1(json.dumps(manifest, sort_keys = True).encode('utf-8')).hexdigest()
+        with self.__locked() as index:
+            #objects are ingested without lock, ingest again in case they were swept in the meantime
+            for relPath, (digest, size) in files.items():
+                if not os.path.exists(self.__object(digest)):
+                    self.__ingest(sources[relPath], stats)
+            entry = index.get(artifactId)
+            if entry == None:
+                entry = manifest
+                entry['created'] = time.time()
+                index[artifactId] = entry
+            entry['name'] = os.path.basename(path)
+            entry['meta'] = meta
+            entry['used'] = time.time()
+            self.__evict(index)
+        _logInfo('artifact published: %s %s, new %s files %s bytes, dedup %s files %s bytes' %(artifactId[:12], entry['name'],
+                 stats.copiedFiles, stats.copiedBytes, stats.skippedFiles, stats.skippedBytes))
+        return artifactId
+
+    def fetch(self, ref, dst):
+        with self.__locked() as index:
+            artifactId = self.__resolve(index, ref)
+            entry = index[artifactId]
+            entry['used'] = time.time()
+            #materialize while locked so objects are not evicted by other processes
+            if os.path.lexists(dst):
+                _del(dst)
+            strategies = [_Transfer.Hardlink, _Transfer.Reflink, _Transfer.Copy]
+            if entry['kind'] == 'file':
+                dir = os.path.dirname(dst)
+                if dir and not os.path.exists(dir):
+                    os.makedirs(dir)
+                _Transfer.file(self.__object(entry['files'][''][0]), dst, strategies)
+            else:
+                os.makedirs(dst)
+                for relPath, (digest, size) in sorted(entry['files'].items()):
+                    itemPath = os.path.join(dst, relPath)
+                    dir = os.path.dirname(itemPath)
+                    if not os.path.exists(dir):
+                        os.makedirs(dir)
+                    _Transfer.file(self.__object(digest), itemPath, strategies)
+                for relPath, target in sorted(entry['links'].items()):
+                    itemPath = os.path.join(dst, relPath)
+                    dir = os.path.dirname(itemPath)
+                    if not os.path.exists(dir):
+                        os.makedirs(dir)
+                    os.symlink(target, itemPath)
+        _logInfo('artifact fetched: %s %s >> %s' %(artifactId[:12], entry['name'], dst))
+        return artifactId
+
+    def list(self):
+        with self.__locked() as index:
+            return dict(index)
+
+    def __resolve(self, index, ref):
+        #exact id, unique id prefix, or the latest artifact with the name
+        if ref in index:
+            return ref
+        matches = [k for k in index if k.startswith(ref)]
+        if len(matches) == 1:
+            return matches[0]
+        named = sorted((v['created'], k) for k, v in index.items() if v.get('name') == ref)
+        if named:
+            return named[-1][1]
+        raise KeyError('artifact not found: %s' %ref)
+
+    def __object(self, digest):
+        return os.path.join(self.__objectsDir, digest[:2], digest)
+
+    def __ingest(self, path, stats):
+        size = os.path.getsize(path)
+        digest = _hashFile(path)
+        objFile = self.__object(digest)
+        if os.path.exists(objFile):
+            #refresh mtime, so the object is not swept before the artifact is indexed
+            try:
+                os.utime(objFile)
+            except OSError:
+                pass
+            stats.add('skipped', 1, size)
+            return [digest, size]
+
+        dir = os.path.dirname(objFile)
+        if not os.path.exists(dir):
+            os.makedirs(dir)
+        #copy aside and rename, other processes never see partial objects
+        tmpFile = '%s.%s.tmp' %(objFile, os.getpid())
+        _Transfer.file(path, tmpFile, [_Transfer.Reflink, _Transfer.Copy])
+        os.chmod(tmpFile, os.stat(tmpFile).st_mode & 0o555)
+        #mtime may be copied from source, objects are aged by time of ingest
+        os.utime(tmpFile)
+        os.replace(tmpFile, objFile)
+        stats.add('copied', 1, size)
+        return [digest, size]
+
+    def __evict(self, index):
+        #remove least recently used artifacts until object size is under budget, the latest one is always kept.
+        #unreferenced objects are swept once out of grace period, the ones still in it count against the budget
+        sizes = {}
+        refs = {}
+        for entry in index.values():
+            for digest, size in set((digest, size) for digest, size in entry['files'].values()):
+                sizes[digest] = size
+                refs[digest] = refs.get(digest, 0) + 1
+
+        deadline = time.time() - _ArtifactStore.GracePeriod
+        def sweep(objFile):
+            if os.path.getmtime(objFile) < deadline:
+                os.remove(objFile)
+                return 0
+            return os.path.getsize(objFile)
+
+        total = sum(sizes.values())
+        for dirPath, dirNames, fileNames in os.walk(self.__objectsDir):
+            for name in fileNames:
+                if name not in refs and not name.endswith('.tmp'):
+                    total += sweep(os.path.join(dirPath, name))
+
+        for artifactId in [k for v, k in sorted((v['used'], k) for k, v in index.items())][:-1]:
+            if total <= self.__budget:
+                break
+            _logInfo('artifact evict: %s %s' %(artifactId[:12], index[artifactId].get('name')))
+            for digest in set(digest for digest, size in index[artifactId]['files'].values()):
+                refs[digest] -= 1
+                if refs[digest] == 0:
+                    objFile = self.__object(digest)
+                    total -= sizes[digest] - (sweep(objFile) if os.path.isfile(objFile) else 0)
+            del index[artifactId]
+        pass
+
+    def __locked(self):
+        #index is loaded and saved under an exclusive file lock, shared by processes using the same store
+        import contextlib
+        @contextlib.contextmanager
+        def locked():
+            with open(os.path.join(self.__storeDir, '.lock'), 'a+') as lockFile:
+                try:
+                    import fcntl
+                    fcntl.flock(lockFile.fileno(), fcntl.LOCK_EX)
+                except ImportError:
+                    import msvcrt
+                    lockFile.seek(0)
+                    msvcrt.locking(lockFile.fileno(), msvcrt.LK_LOCK, 1)
+                try:
+                    with open(self.__indexFile) as f:
+                        index = json.load(f)
+                except (IOError, OSError, ValueError):
+                    index = {}
+                yield index
+                tmpFile = self.__indexFile + '.tmp'
+                with open(tmpFile, 'w') as f:
+                    json.dump(index, f)
+                os.replace(tmpFile, self.__indexFile)
+        return locked()
+    pass
+
+def _publishArtifacts(args, paths, **meta):
+    #publish outputs to artifact store when -store is specified
+    if not args.store:
+        return []
+    store = _ArtifactStore(_fullPath(args.store), args.storeBudget)
+    artifactIds = []
+    with _Phase('store.publish') as ph:
+        for path in paths:
+            if os.path.exists(path):
+                artifactIds.append(store.publish(path, source = path, **meta))
+        ph.fields['artifacts'] = artifactIds
+    return artifactIds
+
+def _checkUnityExe(args):
+    #check unity home and executable
+    if args.unityExe:
+        args.unityExe = _fullPath(args.unityExe)
+    else:
+        args.unityHome = _fullPath(args.unityHome) if args.unityHome else os.environ.get('UNITY_HOME')
+        if args.unityHome and os.path.exists(args.unityHome):
+            if args.winOS:
+                args.unityExe = os.path.join(args.unityHome, 'Unity.exe')
+            elif sys.platform.startswith('linux'):
+                args.unityExe = os.path.join(args.unityHome, 'Editor/Unity')
+            else:
+                args.unityExe = os.path.join(args.unityHome, 'Unity.app/Contents/MacOS/Unity')
+        else:
+            _logInfo('Unity home path not found, use -unityHome argument or define it with an environment variable UNITY_HOME', 1)
+
+    if os.path.exists(args.unityExe) == False:
+        _logInfo('Unity executable not found at: %s' %args.unityExe, 1)
+    pass
+
+class _PlayerBuild:
+    def __init__(self, args):
+        self.args = args
+        self.projPath = _fullPath(args.projPath)
+        self.buildTarget = _BuildTarget.From(args.buildTarget)
+        self.buildOpts = _BuildOptions.From(args.opt, args.exp, args.dev)
+        self.outPath = _correctExt(_fullPath(args.outPath), self.buildTarget, self.buildOpts)
+        self.methodName = '_BuildUtility.BuildPlayer'
+        self.methodArgs = [self.outPath, self.buildTarget, self.buildOpts]
+
+        self.outputs = [self.outPath]
+        if self.buildTarget == _BuildTarget.StandaloneWindows or self.buildTarget == _BuildTarget.StandaloneWindows64:
+            self.outputs.append(os.path.splitext(self.outPath)[0] + '_Data')
+        self.__cache = None
+        self.__start = None
+        pass
+
+    def prepare(self):
+        #return False if output is restored from build cache and unity is not needed
+        args = self.args
+        if args.cache:
+            self.__cache = _BuildCache(_fullPath(args.cache))
+            self.__cacheKey = self.__cache.key(self.projPath, self.buildTarget, self.buildOpts, args.dph, args.unityExe)
+            if self.__cache.restore(self.__cacheKey, self.outputs):
+                return False
+
+        #cleanup, large exported projects are deleted in background while unity runs
+        for out in self.outputs:
+            _del(out, background = True)
+
+        dir = os.path.dirname(self.outPath)
+        if not os.path.exists(dir):
+            os.makedirs(dir)
+        self.__start = time.time()
+        return True
+
+    def finish(self, ret):
+        outPath = self.outPath
+        #place exported project in outPath/ instead of outPath/productName/
+        if ret == 0 and self.buildTarget == _BuildTarget.Android and _BuildOptions.AcceptExternalModifications(self.buildOpts) and not self.args.dph:
+            with _Phase('build.reparent'):
+                for dir in os.listdir(outPath):
+                    expDir = os.path.join(outPath, dir)
+                    if os.path.isdir(expDir):
+                        #rename first in case the exported project contains an item with the same name
+                        tmpDir = os.path.join(outPath, '.%s.tmp' %dir)
+                        os.rename(expDir, tmpDir)
+                        _move(tmpDir, outPath)
+                        break
+
+        if ret == 0 and self.__cache:
+            self.__cache.store(self.__cacheKey, self.outputs, time.time() - self.__start)
+        if ret == 0:
+            self.post()
         pass
 
-    def _cleanup(self, projPath):
-        _del(os.path.join(projPath, 'Assets/_UnityBuildUtility'), ['.meta'])
-        logFilePath = os.path.join(projPath, self.__invokeLogFile)
-        if os.path.exists(logFilePath):
-            logFileHandle = None
-            try:
-                logFileHandle = open(logFilePath)
-                _logInfo('')
-                _logInfo(logFileHandle.read())
-            finally:
-                if logFileHandle:
-                    logFileHandle.close()
-                _del(logFilePath)
-            pass
+    def post(self):
+        #steps on output of a finished build, also run when output is restored from build cache
+        if self.args.archive:
+            _archive(self.outPath, _fullPath(self.args.archive))
+        _publishArtifacts(self.args, self.outputs, projPath = self.projPath, buildTarget = self.buildTarget, buildOpts = self.buildOpts)
         pass
     pass
 
 def _buildCmd(args):
-    #check unity home and executable
-    args.unityHome = _fullPath(args.unityHome) if args.unityHome else os.environ.get('UNITY_HOME')
-    if args.unityHome and os.path.exists(args.unityHome):
-        if args.winOS:
-            args.unityExe = os.path.join(args.unityHome, 'Unity.exe')
-        else:
-            args.unityExe = os.path.join(args.unityHome, 'Unity.app/Contents/MacOS/Unity')
+    _checkUnityExe(args)
 
-        if os.path.exists(args.unityExe) == False:
-            _logInfo('Unity executable not found at: %s' %args.unityExe, 1)
+    build = _PlayerBuild(args)
+    if build.prepare():
+        ivk = _Invoker(build.methodName, build.methodArgs)
+        ret = ivk.invoke(build.projPath, args)
+        build.finish(ret)
     else:
-        _logInfo('Unity home path not found, use -unityHome argument or define it with an environment variable UNITY_HOME', 1)
+        build.post()
+    pass
 
-    projPath = _fullPath(args.projPath)
-    buildTarget = _BuildTarget.From(args.buildTarget)
-    buildOpts = _BuildOptions.From(args.opt, args.exp, args.dev)
-    outPath = _correctExt(_fullPath(args.outPath), buildTarget, buildOpts)
+class _BundleBuild:
+    '''
+    incremental assetbundle build, bundles are kept in {outPath}/{buildTarget} between runs so unity only rebuilds changed ones.
+    unity writes name and hash of each bundle to {outPath}/{buildTarget}.bundles. the summary compares it with the list of last successful build,
+    and -stage copies the changes since the list of last staged build, so builds without -stage do not lose changes to stage.
+    targets of the same project build one after another, the project is locked by each bundles task
+    '''
+    ListSuffix = '.bundles'
+    LastSuffix = '.bundles.last'
+    StagedSuffix = '.bundles.staged'
+    ChangesFile = 'changes.json'
+
+    def __init__(self, args):
+        self.args = args
+        self.projPath = _fullPath(args.projPath)
+        self.buildTarget = _BuildTarget.From(args.buildTarget)
+        self.outDir = os.path.join(_fullPath(args.outPath), self.buildTarget)
+        self.listFile = self.outDir + _BundleBuild.ListSuffix
+        self.lastFile = self.outDir + _BundleBuild.LastSuffix
+        self.stagedFile = self.outDir + _BundleBuild.StagedSuffix
+        self.stageDir = _fullPath(args.stage)
+        self.methodName = '_BuildUtility.BuildAssetBundles'
+        self.methodArgs = [self.outDir, self.buildTarget, args.opt or 'None', self.listFile]
+        pass
 
-    #cleanup
-    _del(outPath)
-    if buildTarget == _BuildTarget.StandaloneWindows or buildTarget == _BuildTarget.StandaloneWindows64:
-        _del(os.path.splitext(outPath)[0] + '_Data')
+    def prepare(self):
+        #stage directory is cleared before staging, only do it to the one staged by us
+        if self.stageDir and os.path.isdir(self.stageDir) and os.listdir(self.stageDir) \
+            and not os.path.isfile(os.path.join(self.stageDir, _BundleBuild.ChangesFile)):
+            _logInfo('stage directory is not empty and not staged before: %s' %self.stageDir, 1)
+        if not os.path.exists(self.outDir):
+            os.makedirs(self.outDir)
+        _del(self.listFile)
+        pass
 
-    dir = os.path.dirname(outPath)
-    if not os.path.exists(dir):
-        os.makedirs(dir)
+    def finish(self, ret):
+        if ret != 0 or not os.path.isfile(self.listFile):
+            return None
+        last = _BundleBuild.readList(self.lastFile)
+        current = _BundleBuild.readList(self.listFile)
+        with _Phase('bundles.diff', buildTarget = self.buildTarget) as ph:
+            changes = _BundleBuild.diff(last, current)
+            for key in ['added', 'changed', 'removed']:
+                for name in changes[key]:
+                    _logInfo('%-8s %s' %(key, name))
+            ph.fields.update(dict((key, len(changes[key])) for key in ['added', 'changed', 'removed', 'unchanged']))
+            _logInfo('bundles: %s added, %s changed, %s removed, %s unchanged' %(
+                ph.fields['added'], ph.fields['changed'], ph.fields['removed'], ph.fields['unchanged']))
+
+        if self.stageDir:
+            with _Phase('bundles.stage', dst = self.stageDir) as ph:
+                stageChanges = _BundleBuild.diff(_BundleBuild.readList(self.stagedFile), current)
+                stagedBytes, totalBytes = self.stage(stageChanges, current)
+                ph.fields.update(stagedBytes = stagedBytes, totalBytes = totalBytes)
+                _logInfo('staged %s of %s bytes to: %s' %(stagedBytes, totalBytes, self.stageDir))
+            shutil.copyfile(self.listFile, self.stagedFile)
+        os.replace(self.listFile, self.lastFile)
+        return changes
+
+    def stage(self, changes, current):
+        #copy added and changed bundles with their manifests, and the root manifest bundle named after the output directory
+        _del(self.stageDir)
+        os.makedirs(self.stageDir)
+        names = changes['added'] + changes['changed']
+        if names or changes['removed']:
+            names.append(self.buildTarget)
+        stagedBytes = 0
+        for name in names:
+            for relPath in [name, name + '.manifest']:
+                src = os.path.join(self.outDir, relPath)
+                if not os.path.isfile(src):
+                    continue
+                stagedBytes += _copy(src, os.path.join(self.stageDir, relPath), stat = True).copiedBytes
+        totalBytes = sum(os.path.getsize(os.path.join(self.outDir, name)) for name in current
+                         if os.path.isfile(os.path.join(self.outDir, name)))
+
+        with open(os.path.join(self.stageDir, _BundleBuild.ChangesFile), 'w') as f:
+            json.dump(dict(changes, buildTarget = self.buildTarget, hashes = current), f, indent = 2)
+        return stagedBytes, totalBytes
 
-    ivk = _Invoker('_BuildUtility.BuildPlayer', [outPath, buildTarget, buildOpts])
-    ret = ivk.invoke(projPath, args)
-    
-    #place exported project in outPath/ instead of outPath/productName/
-    if ret == 0 and buildTarget == _BuildTarget.Android and _BuildOptions.AcceptExternalModifications(buildOpts) and not args.dph:
-        for dir in os.listdir(outPath):
-            expDir = os.path.join(outPath, dir)
-            if os.path.isdir(expDir):
-                _copy(expDir, outPath, True)
-                _del(expDir)
-                break
+    @staticmethod
+    def readList(listFile):
+        #bundle name to hash, one bundle each line separated by tab
+        bundles = {}
+        if os.path.isfile(listFile):
+            with open(listFile, encoding = 'utf-8-sig') as f:
+                for line in f:
+                    name, sep, hash = line.rstrip('\r\n').partition('\t')
+                    if name and sep:
+                        bundles[name] = hash
+        return bundles
+
+    @staticmethod
+    def diff(last, current):
+        return {'added': sorted(name for name in current if name not in last),
+                'changed': sorted(name for name in current if name in last and last[name] != current[name]),
+                'removed': sorted(name for name in last if name not in current),
+                'unchanged': sorted(name for name in current if last.get(name) == current[name])}
     pass
 
-def _invokeCmd(args):
-    #check unity home and executable
-    args.unityHome = _fullPath(args.unityHome) if args.unityHome else os.environ.get('UNITY_HOME')
-    if args.unityHome and os.path.exists(args.unityHome):
-        if args.winOS:
-            args.unityExe = os.path.join(args.unityHome, 'Unity.exe')
-        else:
-            args.unityExe = os.path.join(args.unityHome, 'Unity.app/Contents/MacOS/Unity')
+def _bundlesCmd(args):
+    _checkUnityExe(args)
 
-        if os.path.exists(args.unityExe) == False:
-            _logInfo('Unity executable not found at: %s' %args.unityExe, 1)
-    else:
-        _logInfo('Unity home path not found, use -unityHome argument or define it with an environment variable UNITY_HOME', 1)
+    build = _BundleBuild(args)
+    build.prepare()
+    ivk = _Invoker(build.methodName, build.methodArgs)
+    ret = ivk.invoke(build.projPath, args)
+    build.finish(ret)
+    pass
+
+def _invokeCmd(args):
+    _checkUnityExe(args)
 
     projPath = _fullPath(args.projPath)
     ivk = _Invoker(args.methodName, args.args)
@@ -295,6 +2174,219 @@ def _invokeCmd(args):
     ivk.invoke(projPath, args)
     pass
 
+def _symbolChanges(args):
+    #changes in format Group:+SYMBOLS or Group:-SYMBOLS, applied in order by _BuildUtility.ApplySymbols
+    changes = []
+    for op, items in [('+', args.add), ('-', args.remove)]:
+        for item in items or []:
+            group, sep, symbols = item.partition(':')
+            if not group or not symbols or ',' in item:
+                _logInfo('invalid symbols, format is Group:SYMBOL1;SYMBOL2, got: %s' %item, 1)
+            changes.append('%s:%s%s' %(group, op, symbols))
+    if not changes:
+        _logInfo('no symbols to add or remove', 1)
+    return changes
+
+def _symbolsCall(changes):
+    return ['_BuildUtility.ApplySymbols', '[%s]' %','.join(changes)]
+
+def _symbolsCmd(args):
+    _checkUnityExe(args)
+
+    call = _symbolsCall(_symbolChanges(args))
+    ivk = _Invoker(call[0], call[1:])
+    ivk.invoke(_fullPath(args.projPath), args)
+    pass
+
+def _batchCmd(argsList):
+    #run invoke and build tasks of the same project in one unity launch, return result of each task
+    first = argsList[0]
+    _checkUnityExe(first)
+    for args in argsList[1:]:
+        args.homePath = first.homePath
+        args.winOS = first.winOS
+        args.unityExe = first.unityExe
+        args.unityLog = first.unityLog
+
+    ivk = None
+    build = None
+    built = False
+    launchArgs = first
+    #each call is [call args, task indices, symbol changes]
+    calls = []
+    results = []
+    for i, args in enumerate(argsList):
+        if args.func == _buildCmd:
+            results.append({'task': BUILD, 'status': 'ok', 'log': ''})
+            build = _PlayerBuild(args)
+            launchArgs = args
+            #a build with cache is always the first task of a batch, see _TaskBatch.accept
+            built = build.prepare()
+            if not built:
+                build.post()
+                continue
+            taskCalls = [[build.methodName] + build.methodArgs]
+        elif args.func == _symbolsCmd:
+            results.append({'task': SYMBOLS, 'status': 'ok', 'log': ''})
+            changes = _symbolChanges(args)
+            #consecutive symbols tasks share one call, so the symbols are written once
+            if calls and calls[-1][2] != None:
+                calls[-1][1].append(i)
+                calls[-1][2].extend(changes)
+            else:
+                calls.append([None, [i], changes])
+            continue
+        else:
+            results.append({'task': INVOKE, 'status': 'ok', 'log': ''})
+            taskCalls = [[args.methodName] + args.args] + (args.next or [])
+        for call in taskCalls:
+            calls.append([call, [i], None])
+
+    for call, indices, changes in calls:
+        if changes != None:
+            call = _symbolsCall(changes)
+        if ivk:
+            ivk.append(call[0], call[1:])
+        else:
+            ivk = _Invoker(call[0], call[1:])
+
+    if ivk:
+        ivk.keepInvokeLog = True
+        try:
+            ret = ivk.invoke(_fullPath(first.projPath), launchArgs)
+        finally:
+            #invoke log has a section for each call, calls after a failed one are not executed
+            sections = _Invoker.splitInvokeLog(ivk.invokeLog)
+            for n, (call, indices, changes) in enumerate(calls):
+                for i in indices:
+                    result = results[i]
+                    if n >= len(sections):
+                        result['status'] = 'skipped' if result['status'] == 'ok' else result['status']
+                    else:
+                        result['log'] += sections[n]
+                        if _Invoker.ExceptionTag in sections[n]:
+                            result['status'] = 'failed'
+            for i, result in enumerate(results):
+                _logInfo('[batch] task %s %s: %s' %(i, result['task'], result['status']))
+        if built:
+            build.finish(ret)
+    return results
+
+def _daemonCmd(args):
+    _checkUnityExe(args)
+    projPath = _fullPath(args.projPath)
+    if not os.path.isdir(projPath):
+        _logInfo('projectPath not exist: %s' %projPath, 1)
+
+    _logInfo('===Daemon===')
+    _logInfo('projectPath:     %s' %projPath)
+    _logInfo('stop:            %s' %args.stop)
+    _logInfo('')
+
+    daemon = _Daemon.connect(projPath)
+    if args.stop:
+        if daemon:
+            daemon.stop(args.timeout)
+        else:
+            _logInfo('no running editor daemon found')
+    elif daemon:
+        _logInfo('editor daemon already running, pid: %s, port: %s' %(daemon.pid, daemon.port))
+    else:
+        _Daemon.start(projPath, args)
+    pass
+
+def _matrixCmd(args):
+    projPath = _fullPath(args.projPath)
+    outPath = _fullPath(args.outPath)
+    workDir = _fullPath(args.workDir) if args.workDir else projPath + '_matrix'
+    if not os.path.isdir(projPath):
+        _logInfo('projectPath not exist: %s' %projPath, 1)
+
+    #target spec: {target}[:{flag},{flag}], flags are build options exp, dev and dph
+    groups = {}
+    for spec in args.targets:
+        target, _, flags = spec.partition(':')
+        flags = [f for f in flags.split(',') if f]
+        if target not in _BuildTarget._switch or any(f not in ['exp', 'dev', 'dph'] for f in flags):
+            _logInfo('invalid target spec: %s' %spec, 1)
+        name = '-'.join([target] + flags)
+        groups.setdefault(target, []).append((name, flags))
+    parallel = args.parallel or len(groups)
+
+    _logInfo('===Matrix===')
+    _logInfo('projectPath:     %s' %projPath)
+    _logInfo('outPath:         %s' %outPath)
+    _logInfo('workDir:         %s' %workDir)
+    _logInfo('targets:         %s' %' '.join(args.targets))
+    _logInfo('parallel:        %s' %parallel)
+    _logInfo('')
+
+    #unity locks project directory, each target builds in its own working copy with its own Library
+    for target in groups:
+        clonePath = os.path.join(workDir, target)
+        for item in ['Assets', 'ProjectSettings', 'Packages']:
+            src = os.path.join(projPath, item)
+            if os.path.isdir(src):
+                _copy(src, os.path.join(clonePath, item), sync = True, prune = True)
+        libPath = os.path.join(projPath, 'Library')
+        if os.path.isdir(libPath) and not os.path.isdir(os.path.join(clonePath, 'Library')):
+            _copy(libPath, os.path.join(clonePath, 'Library'), stat = True)
+        _logInfo('working copy ready: %s' %clonePath)
+
+    if not os.path.exists(outPath):
+        os.makedirs(outPath)
+
+    sharedArgs = []
+    for key in ['unityHome', 'unityExe', 'jobs', 'report', 'store', 'storeBudget']:
+        if getattr(args, key):
+            sharedArgs.extend(['-' + key, str(getattr(args, key))])
+    for key in ['nobatch', 'noquit', 'failfast', 'libcache', 'install']:
+        if getattr(args, key):
+            sharedArgs.append('-' + key)
+    for key in ['transfer', 'timeouts']:
+        #values are joined with option name, otherwise they swallow the sub-command
+        for item in getattr(args, key) or []:
+            sharedArgs.append('-%s=%s' %(key, item))
+    if args.unityExtraArgs:
+        #value starts with '-' must be joined with option name
+        sharedArgs.append('-unityExtraArgs=%s' %args.unityExtraArgs)
+
+    def buildGroup(target):
+        results = []
+        for name, flags in groups[target]:
+            argList = [sys.executable, os.path.abspath(__file__),
+                       '-log', os.path.join(outPath, '%s.log' %name),
+                       '-unityLog', os.path.join(outPath, '%s.unity.log' %name)]
+            argList.extend(sharedArgs)
+            argList.extend(['build', os.path.join(workDir, target), target, os.path.join(outPath, name)])
+            if args.opt:
+                argList.extend(['-opt', args.opt])
+            if args.cache:
+                argList.extend(['-cache', args.cache])
+            argList.extend(['-' + f for f in flags])
+
+            _logInfo(' '.join(argList))
+            start = time.time()
+            ret = _call(argList, 'matrix.build', stdout = subprocess.DEVNULL)
+            results.append((name, ret, time.time() - start))
+            _logInfo('%s finished with code %s in %.1fs' %(name, ret, time.time() - start))
+        return results
+
+    start = time.time()
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers = parallel) as pool:
+        results = [r for rs in pool.map(buildGroup, sorted(groups)) for r in rs]
+
+    _logInfo('')
+    _logInfo('===Matrix Result===')
+    for name, ret, elapsed in results:
+        _logInfo('%-24s code: %-4s time: %.1fs' %(name, ret, elapsed))
+    _logInfo('total time: %.1fs' %(time.time() - start))
+    failed = [name for name, ret, elapsed in results if ret != 0]
+    if failed:
+        _logInfo('matrix build failed: %s' %' '.join(failed), 1)
+    pass
+
 def _packageAndroidCmd(args):
     projPath = _fullPath(args.projPath)
     gradlePath = os.path.join(args.homePath, 'gradlew')
@@ -303,26 +2395,42 @@ def _packageAndroidCmd(args):
     taskSuffix = '%s%s' %(args.sfx[0].upper(), args.sfx[1:]) if args.sfx else ''
 
     argList = [os.path.join(gradlePath, 'gradlew.bat' if args.winOS else 'gradlew'), '-p', projPath, '-b', buildFile]
-    if not args.ndp:
-        argList.extend(['-P', 'targetProjDir=%s' %projPath,
-                        '-P', 'buildDir=%s' %os.path.join(projPath, 'build'),
-                        '-P', 'archivesBaseName=%s' %os.path.basename(projPath)])
-    if args.prop:
-        for item in args.prop:
-            argList.append('-P')
-            argList.append(item)
-    
+    if args.daemon:
+        argList.append('--daemon')
+    if args.buildCache:
+        argList.extend(['--build-cache', '--init-script', _gradleBuildCacheScript(args.homePath)])
+    if args.configCache:
+        argList.append('--configuration-cache')
+    if args.parallel:
+        argList.append('--parallel')
+
+    def gradleArgs(taskList, buildDir, projectCacheDir = None):
+        gradleArgList = list(argList)
+        if not args.ndp:
+            gradleArgList.extend(['-P', 'targetProjDir=%s' %projPath,
+                                  '-P', 'buildDir=%s' %buildDir,
+                                  '-P', 'archivesBaseName=%s' %os.path.basename(projPath)])
+        if args.prop:
+            for item in args.prop:
+                gradleArgList.append('-P')
+                gradleArgList.append(item)
+        if projectCacheDir:
+            gradleArgList.extend(['--project-cache-dir', projectCacheDir])
+        gradleArgList.extend(taskList)
+        return gradleArgList
+
+    tasks = []
     if args.task:
-        argList.extend(args.task)
+        tasks.extend(args.task)
     elif args.var:
         if args.pfx == None:
             if args.sfx == None:
                 _logInfo('execute task with variants but prefix and suffix are not found')
             for var in args.var:
-                argList.append('%s%s%s' %(taskPrefix, var, taskSuffix))
+                tasks.append('%s%s%s' %(taskPrefix, var, taskSuffix))
         else:
             for var in args.var:
-                argList.append('%s%s%s%s' %(taskPrefix, var[0].upper(), var[1:], taskSuffix))
+                tasks.append('%s%s%s%s' %(taskPrefix, var[0].upper(), var[1:], taskSuffix))
     else:
         _logInfo('no task to execute', 1)
 
@@ -330,21 +2438,348 @@ def _packageAndroidCmd(args):
         _logInfo('project directory not exist: %s' %projPath, 1)
     if not os.path.isfile(buildFile):
         _logInfo('build.gradle file not exist: %s' %buildFile, 1)
+    split = args.parallel and args.parallel > 1 and len(tasks) > 1
+    if split and args.ndp:
+        #buildDir is a default property, without it concurrent invocations write into the same build directory
+        _logInfo('-parallel requires default build properties to isolate buildDir of each task, remove -ndp', 1)
 
     _logInfo('===Packge Android===')
     _logInfo('projectPath:     %s' %projPath)
     _logInfo('buildFile:       %s' %buildFile)
+    _logInfo('parallel:        %s' %args.parallel)
     _logInfo('')
 
+    async def runGradle(taskName, gradleArgList, buildDir, slots, tag = None):
+        async with slots:
+            _logInfo(' '.join(gradleArgList))
+            start = time.time()
+            with _Phase('gradle.task', task = taskName) as ph:
+                ret = await _callAsync(gradleArgList, 'gradle', tag = tag)
+                outputs = []
+                for dirPath, dirNames, fileNames in os.walk(os.path.join(buildDir, 'outputs')):
+                    outputs.extend(os.path.join(dirPath, name) for name in fileNames if os.path.splitext(name)[1] in ['.apk', '.aab'])
+                ph.fields['code'] = ret
+                ph.fields['outputs'] = outputs
+            return (taskName, ret, time.time() - start, outputs)
+
     try:
-        _logInfo(' '.join(argList))
-        ret = subprocess.call(argList)
-        if ret != 0:
-            _logInfo('execute gradle task failed with retcode: %s' %ret, ret)
+        buildDir = os.path.join(projPath, 'build')
+        if split:
+            #one gradle invocation per task, with isolated build and project cache directories to avoid lock contention
+            async def runAll():
+                import asyncio
+                slots = asyncio.Semaphore(args.parallel)
+                coros = []
+                for task in tasks:
+                    taskBuildDir = os.path.join(buildDir, task)
+                    taskArgList = gradleArgs([task], taskBuildDir, os.path.join(projPath, '.gradle-%s' %task))
+                    coros.append(runGradle(task, taskArgList, taskBuildDir, slots, task))
+                return await asyncio.gather(*coros)
+            results = _runAsync(runAll())[0]
+        else:
+            async def runOne():
+                import asyncio
+                return await runGradle(' '.join(tasks), gradleArgs(tasks, buildDir), buildDir, asyncio.Semaphore(1))
+            results = _runAsync(runOne())
+
+        _logInfo('')
+        for task, ret, elapsed, outputs in results:
+            _logInfo('%-32s code: %-4s time: %.1fs' %(task, ret, elapsed))
+            for output in outputs:
+                _logInfo('    %s' %output)
+        for task, ret, elapsed, outputs in results:
+            if ret != 0:
+                _logInfo('execute gradle task %s failed with retcode: %s' %(task, ret), ret)
+        for task, ret, elapsed, outputs in results:
+            _publishArtifacts(args, outputs, projPath = projPath, task = task)
     except:
         _logInfo('package failed with excpetion', 1)
     pass
 
+def _gradleBuildCacheScript(homePath):
+    #init script to keep gradle local build cache under home path, shared by all projects.
+    #home path may be relative, gradle resolves relative paths against the working directory of its daemon
+    cacheDir = os.path.abspath(os.path.join(homePath, '.gradle-build-cache'))
+    if not os.path.exists(cacheDir):
+        os.makedirs(cacheDir)
+    scriptFile = os.path.join(cacheDir, 'init.gradle')
+    with open(scriptFile, 'w') as f:
+        f.write('settingsEvaluated { settings ->\n')
+        f.write('    settings.buildCache {\n')
+        f.write('        local {\n')
+        f.write('            directory = new File(\'%s\')\n' %cacheDir.replace('\\', '/'))
+        f.write('        }\n')
+        f.write('    }\n')
+        f.write('}\n')
+    return scriptFile
+
+class _XcodeIncremental:
+    FingerprintFile = '_UnityBuildUtility.fingerprint'
+
+    @staticmethod
+    def prepare(homePath, projPath, buildTarget, buildConfig, buildSdk):
+        #derived data is kept per project path, clean is only needed when the project file changed structurally
+        projPath = os.path.abspath(projPath)
+        projKey = hashlib.sha1(projPath.encode('utf-8')).hexdigest()[:16]
+        derivedDataPath = os.path.join(os.path.abspath(homePath), '.xcode-derived-data', projKey)
+        pbxproj = os.path.join(projPath, '%s.xcodeproj' %buildTarget, 'project.pbxproj')
+        sha = hashlib.sha1()
+        sha.update(('%s\n%s\n%s\n' %(buildTarget, buildConfig, buildSdk)).encode('utf-8'))
+        if os.path.isfile(pbxproj):
+            sha.update(_hashFile(pbxproj).encode('utf-8'))
+        fingerprint = sha.hexdigest()
+
+        lastFingerprint = None
+        fingerprintFile = os.path.join(derivedDataPath, _XcodeIncremental.FingerprintFile)
+        if os.path.isfile(fingerprintFile):
+            with open(fingerprintFile, 'r') as f:
+                lastFingerprint = f.read().strip()
+        return (derivedDataPath, fingerprint, fingerprint != lastFingerprint)
+
+    @staticmethod
+    def save(derivedDataPath, fingerprint):
+        if not os.path.exists(derivedDataPath):
+            os.makedirs(derivedDataPath)
+        with open(os.path.join(derivedDataPath, _XcodeIncremental.FingerprintFile), 'w') as f:
+            f.write(fingerprint)
+    pass
+
+class _XcodeBuildSteps:
+    #build step lines printed by xcodebuild, only steps that actually run are printed
+    Steps = ['CompileC', 'CompileSwift', 'CompileSwiftSources', 'CompileAssetCatalog', 'CompileStoryboard', 'Ld', 'Libtool']
+
+    def __init__(self):
+        self.counts = dict((step, 0) for step in _XcodeBuildSteps.Steps)
+        pass
+
+    def feed(self, line):
+        step = line.split(' ', 1)[0]
+        if step in self.counts:
+            self.counts[step] += 1
+
+    def log(self):
+        steps = ['%s=%s' %(step, self.counts[step]) for step in _XcodeBuildSteps.Steps if self.counts[step]]
+        _logInfo('rebuilt steps: %s' %(', '.join(steps) if steps else 'none'))
+    pass
+
+class _Provision:
+    #these key names may change when Apple update the plist format of mobileprovision file
+    #enterprise,    valid for all devices, distribution profile
+    #app-store,     valid only for upload to appstore, distribution profile
+    #development,   valid for limited devices, development profile, allows debugger attach
+    #ad-hoc,        valid for limited devices, distribution profile
+    Types = ['enterprise', 'app-store', 'development', 'ad-hoc']
+
+    @staticmethod
+    def read(provFile):
+        with open(provFile, 'rb') as f:
+            data = f.read()
+        try:
+            content = _Provision.__content(data)
+        except (IndexError, ValueError):
+            content = None
+        if content == None:
+            #not plain DER, fall back to locate the embedded xml plist
+            begin = data.find(b'<?xml')
+            end = data.find(b'</plist>', begin)
+            if begin < 0 or end < 0:
+                raise ValueError('plist not found in provision file: %s' %provFile)
+            content = data[begin:end + len(b'</plist>')]
+        return _Provision.info(plistlib.loads(content))
+
+    @staticmethod
+    def info(provObj):
+        entitlements = provObj.get('Entitlements', {})
+        if provObj.get('ProvisionsAllDevices'):
+            provType = 'enterprise'
+        elif provObj.get('ProvisionedDevices'):
+            provType = 'development' if entitlements.get('get-task-allow') else 'ad-hoc'
+        else:
+            provType = 'app-store'
+
+        teamId = entitlements.get('com.apple.developer.team-identifier') or (provObj.get('TeamIdentifier') or [''])[0]
+        appId = entitlements.get('application-identifier', '')
+        expiration = provObj.get('ExpirationDate')
+        return {'type': provType,
+                'name': provObj.get('Name'),
+                'uuid': provObj.get('UUID'),
+                'teamId': teamId,
+                'teamName': provObj.get('TeamName'),
+                'bundleId': appId[len(teamId) + 1:] if appId.startswith(teamId + '.') else appId,
+                'expiration': expiration.isoformat() if expiration else None}
+
+    @staticmethod
+    def signIdentity(prov):
+        #development identity is matched by prefix, distribution identity is named after the team
+        if prov['type'] == 'development':
+            return 'iPhone Developer: '
+        return 'iPhone Distribution: %s' %prov['teamName']
+
+    @staticmethod
+    def __content(data):
+        #ContentInfo { contentType, [0] SignedData { version, digestAlgorithms, encapContentInfo { eContentType, [0] eContent } } }
+        pos = _Provision.__enter(data, 0, 0x30)
+        pos = _Provision.__skip(data, pos, 0x06)
+        pos = _Provision.__enter(data, pos, 0xa0)
+        pos = _Provision.__enter(data, pos, 0x30)
+        pos = _Provision.__skip(data, pos, 0x02)
+        pos = _Provision.__skip(data, pos, 0x31)
+        pos = _Provision.__enter(data, pos, 0x30)
+        pos = _Provision.__skip(data, pos, 0x06)
+        pos = _Provision.__enter(data, pos, 0xa0)
+        tag, length, pos = _Provision.__header(data, pos)
+        if tag != 0x04 or length == None:
+            return None
+        return data[pos:pos + length]
+
+    @staticmethod
+    def __header(data, pos):
+        tag = data[pos]
+        length = data[pos + 1]
+        pos += 2
+        if length & 0x80:
+            count = length & 0x7f
+            if count == 0:
+                #indefinite length of BER encoding
+                return (tag, None, pos)
+            length = int.from_bytes(data[pos:pos + count], 'big')
+            pos += count
+        return (tag, length, pos)
+
+    @staticmethod
+    def __enter(data, pos, expectTag):
+        tag, length, pos = _Provision.__header(data, pos)
+        if tag != expectTag:
+            raise ValueError('unexpected tag 0x%02x' %tag)
+        return pos
+
+    @staticmethod
+    def __skip(data, pos, expectTag):
+        tag, length, pos = _Provision.__header(data, pos)
+        if tag != expectTag or length == None:
+            raise ValueError('unexpected tag 0x%02x' %tag)
+        return pos + length
+    pass
+
+class _ProvisionIndex:
+    #profiles installed by xcode
+    DefaultDir = '~/Library/MobileDevice/Provisioning Profiles'
+    Suffixes = ['.mobileprovision', '.provisionprofile']
+
+    def __init__(self, indexFile):
+        self.__indexFile = indexFile
+        try:
+            with open(indexFile) as f:
+                index = json.load(f)
+        except (IOError, OSError, ValueError):
+            index = {}
+        #files map path to [size, mtime, hash], profiles map content hash to profile info
+        self.__files = index.get('files', {})
+        self.__profiles = index.get('profiles', {})
+        self.__dirty = False
+        pass
+
+    def load(self, provFile):
+        provFile = _fullPath(provFile)
+        st = os.stat(provFile)
+        last = self.__files.get(provFile)
+        if last and last[0] == st.st_size and last[1] == st.st_mtime and last[2] in self.__profiles:
+            digest = last[2]
+        else:
+            digest = _hashFile(provFile)
+            self.__files[provFile] = [st.st_size, st.st_mtime, digest]
+            self.__dirty = True
+        if digest not in self.__profiles:
+            self.__profiles[digest] = _Provision.read(provFile)
+            self.__dirty = True
+        prov = dict(self.__profiles[digest])
+        prov['file'] = provFile
+        return prov
+
+    def search(self, dirs, bundleId = None, provType = None, teamId = None):
+        import fnmatch
+        result = []
+        for provDir in dirs:
+            provDir = _fullPath(provDir)
+            if not os.path.isdir(provDir):
+                continue
+            for name in sorted(os.listdir(provDir)):
+                if os.path.splitext(name)[1] not in _ProvisionIndex.Suffixes:
+                    continue
+                try:
+                    prov = self.load(os.path.join(provDir, name))
+                except (IOError, OSError, ValueError) as e:
+                    _logInfo('read provision file failed: %s, %s' %(name, e))
+                    continue
+                #bundle id of the profile may contain wildcard, e.g. com.company.*
+                if bundleId and not fnmatch.fnmatchcase(bundleId, prov['bundleId']):
+                    continue
+                if provType and prov['type'] != provType:
+                    continue
+                if teamId and prov['teamId'] != teamId:
+                    continue
+                result.append(prov)
+        return result
+
+    def save(self):
+        if not self.__dirty:
+            return
+        #drop entries of deleted files and profiles no longer referenced
+        self.__files = dict((k, v) for k, v in self.__files.items() if os.path.isfile(k))
+        digests = set(v[2] for v in self.__files.values())
+        self.__profiles = dict((k, v) for k, v in self.__profiles.items() if k in digests)
+        tmpFile = self.__indexFile + '.tmp'
+        with open(tmpFile, 'w') as f:
+            json.dump({'files': self.__files, 'profiles': self.__profiles}, f)
+        os.replace(tmpFile, self.__indexFile)
+        self.__dirty = False
+    pass
+
+def _provisionIndex(homePath):
+    return _ProvisionIndex(os.path.join(homePath, '.provision-index.json'))
+
+def _readProvision(index, provFile):
+    if not os.path.isfile(provFile):
+        _logInfo('provision file not exists: %s' %provFile, 1)
+    try:
+        with _Phase('provision', file = provFile):
+            prov = index.load(provFile)
+    except:
+        _logInfo('get key values from provision file failed: %s' %provFile, 1)
+    prov['teamName'] = _Provision.signIdentity(prov)
+    prov['productName'] = prov['bundleId'].split('.')[-1]
+    return prov
+
+def _writeExportOptions(exportOptFilePath, prov):
+    try:
+        optFile = open(exportOptFilePath, 'w+')
+        optFile.write("""
+<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE plist PUBLIC "-//Apple//DTD PLIST 1.0//EN" "http://www.apple.com/DTDs/PropertyList-1.0.dtd">
+<plist version="1.0">
+    <dict>
+        <key>method</key>
+        <string>%s</string>
+        <key>teamID</key>
+        <string>%s</string>
+        <key>compileBitcode</key>
+        <false/>
+        <key>signingCertificate</key>
+        <string>%s</string>
+        <key>provisioningProfiles</key>
+        <dict>
+            <key>%s</key>
+            <string>%s</string>
+            <key>uploadSymbols</key>
+            <false/>
+        </dict>
+    </dict>
+</plist>
+""" %(prov['type'], prov['teamId'], prov['teamName'], prov['bundleId'], prov['name']))
+        optFile.close()
+    except:
+        _logInfo('create exportOptionsPlist failed', 1)
+
 def _packageiOSCmd(args):
     if args.winOS != False:
         _logInfo('package iOS only support on MacOS', 1)
@@ -353,49 +2788,27 @@ def _packageiOSCmd(args):
     buildConfig = 'Debug' if args.debug else 'Release'
     buildTarget = args.target
     buildSdk = str(args.sdk).lower()
-    pkgOutFile = _fullPath(args.outFile) if args.outFile else projPath + '.ipa'
-    productName = args.proName
-    teamId = None
-    teamName = None
-    bundleId = None
-    provName = None
-    provUUID = None
-    provType = None
-    if args.provFile:
-        provFile = _fullPath(args.provFile)
-        if os.path.isfile(provFile):
-            try:
-                argList = ['security', 'cms', '-D', '-i', provFile]
-                _logInfo(' '.join(argList))
-                provStr = subprocess.check_output(argList)
-                provObj = plistlib.readPlistFromString(provStr)
-
-                #these key names may change when Apple update the plist format of mobileprovision file
-                #enterprise,    valid for all devices, distribution profile
-                #app-store,     valid only for upload to appstore, distribution profile
-                #development,   valid for limited devices, development profile
-                #ad-hoc,        valid for limited devices, distribution profile 
-                validForAll = provObj.get('ProvisionsAllDevices')
-                validForLimited = provObj.get('ProvisionedDevices')
-                if validForAll:
-                    provType = 'enterprise'
-                elif validForLimited:
-                    provType = 'development'
-                    #TODO how to recognize ad-hoc profile?
-                else:
-                    provType = 'app-store'
-
-                teamId = provObj['Entitlements']['com.apple.developer.team-identifier']
-                teamName = 'iPhone Developer: ' if provType == 'development' else 'iPhone Distribution: ' + provObj['TeamName']
-                bundleId = provObj['Entitlements']['application-identifier'][len(teamId) + 1:]
-                provName = provObj['Name']
-                provUUID = provObj['UUID']
-                if productName == None:
-                    productName = provObj['Entitlements']['application-identifier'].split('.')[-1]
-            except:
-                _logInfo('get key values from provision file failed: %s' %provFile, 1)
+    outFiles = args.outFile if args.outFile else []
+    if len(outFiles) > len(args.provFile):
+        _logInfo('more output files than provision files', 1)
+
+    provs = []
+    provIndex = _provisionIndex(args.homePath)
+    for provFile in args.provFile:
+        provs.append(_readProvision(provIndex, _fullPath(provFile)))
+    provIndex.save()
+    for i, prov in enumerate(provs):
+        if i < len(outFiles):
+            prov['outFile'] = _fullPath(outFiles[i])
+        elif len(provs) == 1:
+            prov['outFile'] = projPath + '.ipa'
         else:
-            _logInfo('provision file not exists: %s' %provFile, 1)
+            prov['outFile'] = '%s-%s-%s.ipa' %(projPath, i, prov['type'])
+    #the archive is signed with the first provision profile, exports re-sign it for each profile
+    teamName = provs[0]['teamName']
+    bundleId = provs[0]['bundleId']
+    provUUID = provs[0]['uuid']
+    productName = args.proName if args.proName else provs[0]['productName']
 
     if provUUID == None:
         _logInfo('provision profile not found', 1)
@@ -408,10 +2821,12 @@ def _packageiOSCmd(args):
     _logInfo('buildTarget:          %s' %buildTarget)
     _logInfo('buildSdk:             %s' %buildSdk)
     _logInfo('bundleId:             %s' %bundleId)
-    _logInfo('provision name:       %s' %provName)
-    _logInfo('provision uuid:       %s' %provUUID)
     _logInfo('productName:          %s' %productName)
-    _logInfo('pkgOutFile:           %s' %pkgOutFile)
+    for prov in provs:
+        _logInfo('provision name:       %s' %prov['name'])
+        _logInfo('provision uuid:       %s' %prov['uuid'])
+        _logInfo('provision type:       %s' %prov['type'])
+        _logInfo('pkgOutFile:           %s' %prov['outFile'])
     _logInfo('')
 
     #try resolve the 'User Interaction Is Not Allowed' problem when run from shell
@@ -420,19 +2835,33 @@ def _packageiOSCmd(args):
     if args.keychain:
         argList = ['security', 'unlock-keychain', '-p', args.keychain[1], _fullPath(args.keychain[0])]
         _logInfo(' '.join(argList))
-        ret = subprocess.call(argList)
+        ret = _call(argList, 'security.unlock')
         if ret != 0:
             _logInfo('unlock keychain failed with retcode: %s' %ret)
 
-    argList = ['xcodebuild',
-               '-project', os.path.join(projPath, '%s.xcodeproj' %buildTarget),
-               '-target', buildTarget,
-               '-configuration', buildConfig,
-               'clean']
-    _logInfo(' '.join(argList))
-    ret = subprocess.call(argList)
-    if ret != 0:
-        _logInfo('execute clean failed with retcode: %s' %ret, ret)
+    #incremental mode keeps derived data between runs and only cleans when xcode project changed
+    derivedDataPath = None
+    fingerprint = None
+    doClean = True
+    if args.incremental:
+        derivedDataPath, fingerprint, doClean = _XcodeIncremental.prepare(args.homePath, projPath, buildTarget, buildConfig, buildSdk)
+        _logInfo('derivedDataPath:      %s' %derivedDataPath)
+        _logInfo('clean:                %s' %doClean)
+        _logInfo('')
+
+    if doClean and derivedDataPath:
+        #the scheme archive builds in derived data, which a target clean does not touch
+        _del(derivedDataPath)
+    elif doClean:
+        argList = ['xcodebuild',
+                   '-project', os.path.join(projPath, '%s.xcodeproj' %buildTarget),
+                   '-target', buildTarget,
+                   '-configuration', buildConfig,
+                   'clean']
+        _logInfo(' '.join(argList))
+        ret = _call(argList, 'xcodebuild.clean')
+        if ret != 0:
+            _logInfo('execute clean failed with retcode: %s' %ret, ret)
 
     archiveOutPath = os.path.join(projPath, 'build/%s.xcarchive' %buildTarget)
     #the default name of scheme should be the same as build target
@@ -450,78 +2879,114 @@ def _packageiOSCmd(args):
                         'STRIP_INSTALLED_PRODUCT=YES',
                         'SEPARATE_STRIP=YES',
                         'COPY_PHASE_STRIP=YES'])
+    if derivedDataPath:
+        argList.extend(['-derivedDataPath', derivedDataPath])
+    if args.parallelizeTargets:
+        argList.append('-parallelizeTargets')
     argList.extend(['archive', '-archivePath', archiveOutPath])
 
     if args.opt:
         argList.extend(args.opt)
     _logInfo(' '.join(argList))
-    ret = subprocess.call(argList)
+    steps = _XcodeBuildSteps()
+    with _Phase('xcodebuild.steps', incremental = args.incremental, clean = doClean) as ph:
+        ret = _call(argList, 'xcodebuild.archive', onLine = steps.feed)
+        ph.fields.update(steps.counts)
+    steps.log()
     if ret != 0:
         _logInfo('execute xcodebuild failed with retcode: %s' %ret, ret)
+    if args.incremental:
+        _XcodeIncremental.save(derivedDataPath, fingerprint)
     #check if build succeed
     if not os.path.exists(archiveOutPath):
         _logInfo('xcodebuild archive output file not exist: %s' %archiveOutPath, 1)
 
-    exportOptFilePath = os.path.join(os.path.dirname(archiveOutPath), '%s.plist' %buildTarget)
-    try:
-        optFile = open(exportOptFilePath, 'w+')
-        optFile.write("""
-<?xml version="1.0" encoding="UTF-8"?>
-<!DOCTYPE plist PUBLIC "-//Apple//DTD PLIST 1.0//EN" "http://www.apple.com/DTDs/PropertyList-1.0.dtd">
-<plist version="1.0">
-    <dict>
-        <key>method</key>
-        <string>%s</string>
-        <key>teamID</key>
-        <string>%s</string>
-        <key>compileBitcode</key>
-        <false/>
-        <key>signingCertificate</key>
-        <string>%s</string>
-        <key>provisioningProfiles</key>
-        <dict>
-            <key>%s</key>
-            <string>%s</string>
-            <key>uploadSymbols</key>
-            <false/>
-        </dict>
-    </dict>
-</plist>
-""" %(provType, teamId, teamName, bundleId, provName))
-        optFile.close()
-    except:
-        _logInfo('create exportOptionsPlist failed', 1)
-
     exportPath = os.path.dirname(archiveOutPath)
-    argList = ['xcodebuild',
-               '-exportArchive',
-               '-archivePath', archiveOutPath,
-               '-exportPath', exportPath,
-               '-configuration', buildConfig,
-               '-exportOptionsPlist', exportOptFilePath]
+    async def export(index, prov):
+        #each export uses its own directory and options plist, so they can run against the same archive concurrently
+        provExportPath = os.path.join(exportPath, 'export-%s' %index) if len(provs) > 1 else exportPath
+        if not os.path.exists(provExportPath):
+            os.makedirs(provExportPath)
+        exportOptFilePath = os.path.join(provExportPath, '%s.plist' %buildTarget)
+        _writeExportOptions(exportOptFilePath, prov)
+        argList = ['xcodebuild',
+                   '-exportArchive',
+                   '-archivePath', archiveOutPath,
+                   '-exportPath', provExportPath,
+                   '-configuration', buildConfig,
+                   '-exportOptionsPlist', exportOptFilePath]
+        _logInfo(' '.join(argList))
+        with _Phase('export', type = prov['type'], provision = prov['name']):
+            ret = await _callAsync(argList, 'xcodebuild.export', tag = prov['type'] if len(provs) > 1 else None)
+        return (provExportPath, ret)
 
-    _logInfo(' '.join(argList))
-    ret = subprocess.call(argList)
-    if ret != 0:
-        _logInfo('execute xcrun failed with retcode: %s' %ret, ret)
-    pass
-    #check if export package succeed
-    pkgSrcFile = os.path.join(exportPath, "%s.ipa" %buildTarget)
-    if os.path.exists(pkgSrcFile):
-        _copy(pkgSrcFile, pkgOutFile)
-        _del(pkgSrcFile)
-    else:
-        _logInfo('exported package file not exist: %s' %pkgSrcFile, 1)
+    results = _runAsync(*[export(i, prov) for i, prov in enumerate(provs)])
+
+    for prov, (provExportPath, ret) in zip(provs, results):
+        if ret != 0:
+            _logInfo('export %s with %s failed with retcode: %s' %(prov['type'], prov['name'], ret), ret)
+    for prov, (provExportPath, ret) in zip(provs, results):
+        #check if export package succeed
+        pkgSrcFile = os.path.join(provExportPath, "%s.ipa" %buildTarget)
+        if os.path.exists(pkgSrcFile):
+            _move(pkgSrcFile, prov['outFile'])
+        else:
+            _logInfo('exported package file not exist: %s' %pkgSrcFile, 1)
 
     #exoprt archive files
     if args.archiveFile:
         archiveSrcFile = os.path.join(exportPath, "%s.xcarchive" %buildTarget)
         archiveOutFile = _fullPath(args.archiveFile)
         if os.path.exists(archiveSrcFile):
-            _copy(archiveSrcFile, archiveOutFile)
-            _del(archiveSrcFile)
+            if _isArchiveFile(archiveOutFile):
+                _archive(archiveSrcFile, archiveOutFile)
+            else:
+                _move(archiveSrcFile, archiveOutFile)
         else:
-            _logInfo('exported archive file not exist: %s' %archiveFile, 1)
+            _logInfo('exported archive file not exist: %s' %archiveSrcFile, 1)
+
+    for prov in provs:
+        _publishArtifacts(args, [prov['outFile']], projPath = projPath, provision = prov['name'], type = prov['type'])
+    if args.archiveFile:
+        _publishArtifacts(args, [_fullPath(args.archiveFile)], projPath = projPath)
+
+def _provCmd(args):
+    dirs = args.dirs if args.dirs else [_ProvisionIndex.DefaultDir]
+    _logInfo('===Provision===')
+    _logInfo('dirs:     %s' %', '.join(dirs))
+    _logInfo('bundleId: %s' %args.bundleId)
+    _logInfo('type:     %s' %args.type)
+    _logInfo('teamId:   %s' %args.teamId)
+    _logInfo('')
+
+    index = _provisionIndex(args.homePath)
+    with _Phase('provision.search') as ph:
+        provs = index.search(dirs, args.bundleId, args.type, args.teamId)
+        ph.fields['matches'] = provs
+    index.save()
+    for prov in provs:
+        _logInfo('%-12s %-36s %-10s %-32s %s %s' %(prov['type'], prov['uuid'], prov['teamId'], prov['bundleId'], prov['expiration'], prov['name']))
+        _logInfo('    %s' %prov['file'])
+    _logInfo('%s provision profiles found' %len(provs))
+    pass
+
+def _fetchCmd(args):
+    storeDir = _fullPath(args.storeDir)
+    dst = _fullPath(args.dst)
+
+    _logInfo('===Fetch===')
+    _logInfo('store:    %s' %storeDir)
+    _logInfo('artifact: %s' %args.artifact)
+    _logInfo('dst:      %s' %dst)
+
+    if not os.path.isdir(storeDir):
+        _logInfo('artifact store not exist: %s' %storeDir, 1)
+    try:
+        with _Phase('store.fetch', artifact = args.artifact):
+            _ArtifactStore(storeDir).fetch(args.artifact, dst)
+    except KeyError as e:
+        _logInfo(str(e), 1)
+    pass
 
 def _copyCmd(args):
     src = _fullPath(args.src)
@@ -532,8 +2997,11 @@ def _copyCmd(args):
     _logInfo('dst:     %s' %dst)
     _logInfo('append:  %s' %args.append)
     _logInfo('stat:    %s' %args.stat)
+    _logInfo('sync:    %s' %args.sync)
+    _logInfo('prune:   %s' %args.prune)
 
-    _copy(src, dst, args.append, args.stat)
+    stats = _copy(src, dst, args.append, args.stat, sync = args.sync, checksum = args.checksum, prune = args.prune)
+    stats.log()
     pass
 
 def _delCmd(args):
@@ -545,20 +3013,39 @@ def _delCmd(args):
         for suffix in args.sfx:
             _logInfo('path:    %s%s' %(path, suffix))
     
-    _del(path, args.sfx)
+    _del(path, args.sfx, args.background)
     pass
 
 #commandline argument parse
 def _parse_args(explicitArgs = None):
     parser = argparse.ArgumentParser(description = 'build util for Unity')
     parser.add_argument('-log', help = 'build util log file path')
+    parser.add_argument('-report', help = 'phase timing report file path, records are appended as json lines')
     parser.add_argument('-wmode', action = 'store_true', help = 'use w mode to open log file, by default the mode is a')
+    parser.add_argument('-logMaxSize', type = float,
+        help = 'rotate log file when it grows over size in MB, %s backups are kept as .1 to .%s. single-process only, do not use it when concurrent processes share the log file' %(_LogPipeline.BackupCount, _LogPipeline.BackupCount))
     parser.add_argument('-unityHome', help = 'unity home path')
+    parser.add_argument('-unityExe', help = 'unity executable path, use the one under unity home path by default')
     parser.add_argument('-unityLog', help = 'unity editor log file path')
     parser.add_argument('-buildTarget', choices = ['Android', 'iOS', 'Win', 'Win64', 'OSXUniversal'],
         help = 'switch active build target before loading project')
+    parser.add_argument('-failfast', action = 'store_true',
+        help = 'kill unity editor as soon as a compile error or fatal error appears in unity log, works together with -unityLog')
     parser.add_argument('-nobatch', action = 'store_true', help = 'run unity without -batchmode')
     parser.add_argument('-noquit', action = 'store_true', help = 'run unity without -quit')
+    parser.add_argument('-libcache', action = 'store_true',
+        help = 'keep a Library snapshot for each build target beside the project Library and swap it in before launching unity')
+    parser.add_argument('-install', action = 'store_true',
+        help = 'install editor scripts once as an embedded package with version stamp instead of copying them into Assets on every run, unity 2018.1 or newer')
+    parser.add_argument('-cleanup', action = 'store_true', help = 'remove the installed editor package after the run')
+    parser.add_argument('-jobs', type = int, help = 'max worker threads for file operations like copy, number of cpus + 4 by default')
+    parser.add_argument('-transfer', nargs = '+', action = 'extend', choices = _Transfer.All,
+        help = 'strategies tried in order to move build outputs, %s by default' %' '.join(_Transfer.All))
+    parser.add_argument('-timeouts', nargs = '+', action = 'extend',
+        help = 'kill child process tree after timeout, in format phase=seconds, e.g. unity=3600 gradle=1800 xcodebuild=3600. unity also limits each request to editor daemon')
+    parser.add_argument('-store', help = 'publish outputs of build, packandroid and packios to the content-addressed artifact store directory')
+    parser.add_argument('-storeBudget', type = float,
+        help = 'size budget of artifact store in GB, least recently used artifacts are evicted, %s by default' %_ArtifactStore.DefaultBudget)
     parser.add_argument('-unityExtraArgs', help = 'run unity with extra command line arguments, split with space, usage: -unityExtraArgs "-arg1 xxx -arg2 -arg3 xxx"')
 
     subparsers = parser.add_subparsers(help = 'sub-command list')
@@ -570,6 +3057,21 @@ def _parse_args(explicitArgs = None):
     invoke.add_argument('-next', action = 'append', nargs = '+', help = 'next method and arguments to invoke')
     invoke.set_defaults(func = _invokeCmd)
 
+    symbols = subparsers.add_parser('symbols',
+        help = 'add and remove scripting define symbols of build target groups, each changed group is written once and unchanged groups are not written')
+    symbols.add_argument('projPath', help = 'target unity project path')
+    symbols.add_argument('-add', nargs = '+', metavar = 'GROUP:SYMBOLS',
+                         help = 'symbols to add, split with semicolon, usage: -add "Android:USE_SDK;LOG_OFF" "iOS:USE_SDK"')
+    symbols.add_argument('-remove', nargs = '+', metavar = 'GROUP:SYMBOLS', help = 'symbols to remove, in the same format as -add')
+    symbols.set_defaults(func = _symbolsCmd)
+
+    daemon = subparsers.add_parser('daemon', help = 'start or stop a long-lived unity editor, invoke and build will run in it instead of launching a new one')
+    daemon.add_argument('projPath', help = 'target unity project path')
+    daemon.add_argument('-port', type = int, help = 'local tcp port to serve invoke requests, a free port by default')
+    daemon.add_argument('-timeout', type = int, default = 600, help = 'seconds to wait for the editor to start or stop, 600 by default')
+    daemon.add_argument('-stop', action = 'store_true', help = 'stop the running editor daemon')
+    daemon.set_defaults(func = _daemonCmd)
+
     build = subparsers.add_parser('build', help='build player for unity project')
     build.add_argument('projPath', help = 'target unity project path')
     build.add_argument('buildTarget', choices = ['android', 'ios', 'win', 'win64', 'osx', 'osx64'],
@@ -580,8 +3082,31 @@ def _parse_args(explicitArgs = None):
     build.add_argument('-dev', action = 'store_true', help = 'enable unity development build, with debug symbols and internal profiler')
     build.add_argument('-dph', action = 'store_true',
                        help = 'unity export android project to outPath/{productName}/{exportProj} by default, without this option, project will be export to outPath/{exportProj}')
+    build.add_argument('-archive', help = 'also compress output into archive file, .zip (parallel deflate) or .tar.zst (zstandard module required)')
+    build.add_argument('-cache', help = 'build cache directory, restore previous output instead of invoking unity when project inputs and build arguments are unchanged')
     build.set_defaults(func = _buildCmd)
 
+    bundles = subparsers.add_parser('bundles', help = 'build assetbundles incrementally with chunk based compression, and stage changed bundles')
+    bundles.add_argument('projPath', help = 'target unity project path')
+    bundles.add_argument('buildTarget', choices = ['android', 'ios', 'win', 'win64', 'osx', 'osx64'], help = 'build target type')
+    bundles.add_argument('outPath', help = 'persistent output path, bundles of each target are kept in outPath/{BuildTarget} for incremental builds')
+    bundles.add_argument('-opt', help = 'extra assetbundle options, see UnityEditor.BuildAssetBundleOptions for detail')
+    bundles.add_argument('-stage',
+                         help = '''copy added and changed bundles since last staged build into this directory, with changes.json listing added, changed and removed bundles.
+                         the directory is cleared first, a non-empty one must be staged before''')
+    bundles.set_defaults(func = _bundlesCmd)
+
+    matrix = subparsers.add_parser('matrix', help = 'build players for multiple targets concurrently, each target in its own working copy of the project')
+    matrix.add_argument('projPath', help = 'target unity project path')
+    matrix.add_argument('outPath', help = 'build output directory, each target builds to outPath/{name}')
+    matrix.add_argument('-targets', nargs = '+', required = True,
+                        help = 'target specs, {target}[:{flag},{flag}], target is one of android, ios, win, win64, osx, osx64, flags are exp, dev, dph. eg: android:exp,dev ios win64')
+    matrix.add_argument('-workDir', help = 'directory of per target working copies, {projPath}_matrix by default')
+    matrix.add_argument('-parallel', type = int, help = 'max concurrent builds, number of targets by default')
+    matrix.add_argument('-opt', help = 'build options for all targets, see UnityEditor.BuildOptions for detail')
+    matrix.add_argument('-cache', help = 'build cache directory, see build -cache')
+    matrix.set_defaults(func = _matrixCmd)
+
     packandroid = subparsers.add_parser('packandroid', help = 'pacakge android project with gralde')
     packandroid.add_argument('projPath', help = 'target project path')
     packandroid.add_argument('-buildFile', help = 'specifies the build file')
@@ -595,13 +3120,26 @@ def _parse_args(explicitArgs = None):
                              help = '''additional gradle build properties,
                              targetProjDir={projPath}, buildDir={projPath/build}, archivesBaseName={dirName(projPath)} by default''')
     packandroid.add_argument('-ndp', action = 'store_true', help = 'does not add default build properties')
+    packandroid.add_argument('-daemon', action = 'store_true', help = 'run with gradle daemon, which stays warm for later calls')
+    packandroid.add_argument('-buildCache', action = 'store_true',
+                             help = 'enable gradle build cache, the local cache is stored in {homePath}/.gradle-build-cache')
+    packandroid.add_argument('-configCache', action = 'store_true', help = 'enable gradle configuration cache')
+    packandroid.add_argument('-parallel', type = int,
+                             help = '''split tasks into N concurrent gradle invocations, each task uses buildDir={projPath}/build/{task}
+                             and --project-cache-dir={projPath}/.gradle-{task}. can not be used with -ndp''')
     packandroid.set_defaults(func = _packageAndroidCmd)
 
     packios = subparsers.add_parser('packios', help = 'pacakge iOS project with xCode')
     packios.add_argument('projPath', help = 'target project path')
-    packios.add_argument('-provFile', help = 'path of the .mobileprovision file', required = True)
-    packios.add_argument('-outFile', help = 'package file output path')
-    packios.add_argument('-archiveFile', help = 'archive output path, for package and dsym files backup')
+    packios.add_argument('-provFile', nargs = '+', required = True,
+                     help = '''path of the .mobileprovision files,
+                     archive once with the first one and export a package for each of them''')
+    packios.add_argument('-outFile', nargs = '+',
+                     help = '''package file output paths, one for each provision file.
+                     {projPath}.ipa by default for single provision file, {projPath}-{index}-{type}.ipa for more''')
+    packios.add_argument('-archiveFile',
+                     help = '''archive output path, for package and dsym files backup.
+                     compress into archive directly when path ends with .zip (parallel deflate) or .tar.zst (zstandard module required)''')
     packios.add_argument('-proName', help = 'specifies the product name')
     packios.add_argument('-debug', action = 'store_true', help = 'use Debug or Release build configuration')
     packios.add_argument('-target', default = 'Unity-iPhone', help = 'build target, Unity-iPhone by default')
@@ -615,6 +3153,9 @@ def _parse_args(explicitArgs = None):
                      PRODUCT_NAME={proName} DEPLOYMENT_POSTPROCESSING=YES, STRIP_INSTALLED_PRODUCT=YES, SEPARATE_STRIP=YES, COPY_PHASE_STRIP=YES by default.
                      check https://developer.apple.com/library/mac/documentation/DeveloperTools/Reference/XcodeBuildSettingRef for more information''')
     packios.add_argument('-ndo', action = 'store_true', help = 'does not add default build options')
+    packios.add_argument('-incremental', action = 'store_true',
+                     help = '''keep derived data in {homePath}/.xcode-derived-data and skip clean while xcode project not changed''')
+    packios.add_argument('-parallelizeTargets', action = 'store_true', help = 'build independent targets in parallel')
     packios.set_defaults(func = _packageiOSCmd)
 
     copy = subparsers.add_parser('copy', help = 'copy file or directory')
@@ -624,17 +3165,59 @@ def _parse_args(explicitArgs = None):
                       help = 'append files from src to dst instead of delete dst before copy, only take effect when copy directory')
     copy.add_argument('-stat', default = False, action = 'store_true',
                       help = 'copy the permission bits, last access time, last modification time, and flags')
+    copy.add_argument('-sync', default = False, action = 'store_true',
+                      help = 'only copy files which size or modification time differ from dst, implies -append')
+    copy.add_argument('-checksum', default = False, action = 'store_true',
+                      help = 'compare file content instead of modification time in -sync mode')
+    copy.add_argument('-prune', default = False, action = 'store_true',
+                      help = 'delete files in dst which are not exist in src, only take effect with -sync')
     copy.set_defaults(func = _copyCmd)
 
+    prov = subparsers.add_parser('prov', help = 'search provision profiles')
+    prov.add_argument('dirs', nargs = '*', help = 'directories of provision files, %s by default' %_ProvisionIndex.DefaultDir)
+    prov.add_argument('-bundleId', help = 'match bundle id, wildcard profiles are matched too')
+    prov.add_argument('-type', choices = _Provision.Types, help = 'match provision type')
+    prov.add_argument('-teamId', help = 'match team id')
+    prov.set_defaults(func = _provCmd)
+
+    fetch = subparsers.add_parser('fetch', help = 'materialize an artifact from artifact store, with hardlinks where possible')
+    fetch.add_argument('storeDir', help = 'artifact store directory')
+    fetch.add_argument('artifact', help = 'artifact id, id prefix, or name for the latest artifact with the name')
+    fetch.add_argument('dst', help = 'output path, hardlinked files are read-only')
+    fetch.set_defaults(func = _fetchCmd)
+
     delete = subparsers.add_parser('del', help = 'delete file or directory')
     delete.add_argument('src', help = 'path to delete')
     delete.add_argument('-sfx', nargs = '*', help = 'also delete path (src + suffix), useful for unity .meta files')
+    delete.add_argument('-async', dest = 'background', action = 'store_true',
+                        help = 'rename directory to a tombstone and delete it with parallel workers, wait for it before exit')
     delete.set_defaults(func = _delCmd)
 
     return parser.parse_args(explicitArgs)
     pass
 
 def _run(args):
+    _prepareRun(args)
+    try:
+        with _Phase('task', cmd = args.func.__name__):
+            args.func(args)
+    finally:
+        _pendingDeletes.wait()
+        _report.flush()
+        _logPipeline.flush()
+    return list(_report.records)
+
+def _parseTimeouts(items):
+    timeouts = {}
+    for item in items:
+        phase, sep, seconds = item.partition('=')
+        try:
+            timeouts[phase] = float(seconds)
+        except ValueError:
+            _logInfo('invalid timeout: %s, phase=seconds is expected' %item, 1)
+    return timeouts
+
+def _prepareRun(args):
     #workspace home
     args.homePath = os.path.dirname(sys.argv[0])
 
@@ -645,24 +3228,44 @@ def _run(args):
         dir = os.path.dirname(args.log)
         if not os.path.exists(dir):
             os.makedirs(dir)
-    _initLogging(args.homePath, args.log, args.wmode)
+    _initLogging(args.homePath, args.log, args.wmode, args.logMaxSize)
+
+    global _report, _fileJobs, _transferStrategies, _phaseTimeouts
+    args.report = _fullPath(args.report)
+    if args.report:
+        dir = os.path.dirname(args.report)
+        if not os.path.exists(dir):
+            os.makedirs(dir)
+    _report = _Report(args.report)
+    _handleTerminate()
+
+    if args.jobs:
+        _fileJobs = max(1, args.jobs)
+    if args.transfer:
+        _transferStrategies = args.transfer
+    if args.timeouts:
+        _phaseTimeouts = _parseTimeouts(args.timeouts)
 
     #system environment
     if sys.platform.startswith('win32'):
         args.winOS = True
-    elif sys.platform.startswith('darwin'):
+    elif sys.platform.startswith('darwin') or sys.platform.startswith('linux'):
         args.winOS = False
     else:
         _logInfo('Unsupported platform: %s' %sys.platform, 1)
-
-    args.func(args)
     pass
 
 #script interface
 INVOKE = 'invoke'
+SYMBOLS = 'symbols'
+DAEMON = 'daemon'
 BUILD = 'build'
+BUNDLES = 'bundles'
+MATRIX = 'matrix'
 PACK_ANDROID = 'packandroid'
 PACK_IOS = 'packios'
+PROV = 'prov'
+FETCH = 'fetch'
 COPY = 'copy'
 DEL = 'del'
 
@@ -671,12 +3274,24 @@ class _ScriptTaskArgParser(dict):
         cmd = self.__common()
         if cmd == INVOKE:
             self.__invoke()
+        elif cmd == SYMBOLS:
+            self.__symbols()
+        elif cmd == DAEMON:
+            self.__daemon()
         elif cmd == BUILD:
             self.__build()
+        elif cmd == BUNDLES:
+            self.__bundles()
+        elif cmd == MATRIX:
+            self.__matrix()
         elif cmd == PACK_ANDROID:
             self.__packandroid()
         elif cmd == PACK_IOS:
             self.__packios()
+        elif cmd == PROV:
+            self.__prov()
+        elif cmd == FETCH:
+            self.__fetch()
         elif cmd == COPY:
             self.__copy()
         elif cmd == DEL:
@@ -686,11 +3301,28 @@ class _ScriptTaskArgParser(dict):
     def __common(self):
         self.__appends('-log', self.log)
         self.__appendb('-wmode', self.wmode)
+        self.__appends('-logMaxSize', str(self.logMaxSize) if self.logMaxSize else None)
+        self.__appends('-report', self.report)
         self.__appends('-unityHome', self.unityHome)
+        self.__appends('-unityExe', self.unityExe)
         self.__appends('-unityLog', self.unityLog)
-        self.__appends('-buildTarget', self.buildTarget)
+        if self.cmd not in [BUILD, BUNDLES]:
+            #build target of build and bundles task is a positional argument
+            self.__appends('-buildTarget', self.buildTarget)
+        self.__appendb('-failfast', self.failfast)
         self.__appendb('-nobatch', self.nobatch)
         self.__appendb('-noquit', self.noquit)
+        if self.unityExtraArgs:
+            #value starts with '-' must be joined with option name
+            self.__append('-unityExtraArgs=%s' %self.unityExtraArgs)
+        self.__appendb('-libcache', self.libcache)
+        self.__appendb('-install', self.install)
+        self.__appendb('-cleanup', self.cleanup)
+        self.__appends('-jobs', str(self.jobs) if self.jobs else None)
+        self.__appendl('-transfer', self.transfer)
+        self.__appendl('-timeouts', self.timeouts)
+        self.__appends('-store', self.store)
+        self.__appends('-storeBudget', str(self.storeBudget) if self.storeBudget else None)
         return self.cmd
 
     def __invoke(self):
@@ -706,6 +3338,19 @@ class _ScriptTaskArgParser(dict):
                     self.__append('-next')
                 self.__extend(c)
 
+    def __symbols(self):
+        self.__append(self.cmd)
+        self.__append(self.projPath)
+        self.__appends('-add', self.add)
+        self.__appends('-remove', self.remove)
+
+    def __daemon(self):
+        self.__append(self.cmd)
+        self.__append(self.projPath)
+        self.__appends('-port', str(self.port) if self.port else None)
+        self.__appends('-timeout', str(self.timeout) if self.timeout else None)
+        self.__appendb('-stop', self.stop)
+
     def __build(self):
         self.__append(self.cmd)
         self.__append(self.projPath)
@@ -715,6 +3360,26 @@ class _ScriptTaskArgParser(dict):
         self.__appendb('-exp', self.exp)
         self.__appendb('-dev', self.dev)
         self.__appendb('-dph', self.dph)
+        self.__appends('-cache', self.cache)
+        self.__appends('-archive', self.archive)
+
+    def __bundles(self):
+        self.__append(self.cmd)
+        self.__append(self.projPath)
+        self.__append(self.buildTarget)
+        self.__append(self.outPath)
+        self.__appends('-opt', self.opt)
+        self.__appends('-stage', self.stage)
+
+    def __matrix(self):
+        self.__append(self.cmd)
+        self.__append(self.projPath)
+        self.__append(self.outPath)
+        self.__appends('-targets', self.targets)
+        self.__appends('-workDir', self.workDir)
+        self.__appends('-parallel', str(self.parallel) if self.parallel else None)
+        self.__appends('-opt', self.opt)
+        self.__appends('-cache', self.cache)
 
     def __packandroid(self):
         self.__append(self.cmd)
@@ -728,6 +3393,10 @@ class _ScriptTaskArgParser(dict):
             self.__appends('-sfx', self.sfx)
         self.__appends('-prop', self.prop)
         self.__appendb('-ndp', self.ndp)
+        self.__appendb('-daemon', self.daemon)
+        self.__appendb('-buildCache', self.buildCache)
+        self.__appendb('-configCache', self.configCache)
+        self.__appends('-parallel', str(self.parallel) if self.parallel else None)
 
     def __packios(self):
         self.__append(self.cmd)
@@ -741,17 +3410,38 @@ class _ScriptTaskArgParser(dict):
         self.__appends('-sdk', self.sdk)
         self.__appends('-keychain', self.keychain)
         self.__appends('-opt', self.opt)
-        self.__appends('-ndo', self.ndo)
+        self.__appendb('-ndo', self.ndo)
+        self.__appendb('-incremental', self.incremental)
+        self.__appendb('-parallelizeTargets', self.parallelizeTargets)
+
+    def __prov(self):
+        self.__append(self.cmd)
+        self.__extend(self.dirs)
+        self.__appends('-bundleId', self.bundleId)
+        self.__appends('-type', self.type)
+        self.__appends('-teamId', self.teamId)
+
+    def __fetch(self):
+        self.__append(self.cmd)
+        self.__append(self.storeDir)
+        self.__append(self.artifact)
+        self.__append(self.dst)
 
     def __copy(self):
+        self.__append(self.cmd)
         self.__append(self.src)
         self.__append(self.dst)
         self.__appendb('-append', self.append)
         self.__appendb('-stat', self.stat)
+        self.__appendb('-sync', self.sync)
+        self.__appendb('-checksum', self.checksum)
+        self.__appendb('-prune', self.prune)
 
     def __del(self):
+        self.__append(self.cmd)
         self.__append(self.src)
         self.__appends('-sfx', self.sfx)
+        self.__appendb('-async', self.background)
 
     def __init__(self, o, **kwargs):
         self.__arglist = []
@@ -777,6 +3467,12 @@ class _ScriptTaskArgParser(dict):
             else:
                 self.__append(v)
 
+    def __appendl(self, k, v):
+        #shared options with multiple values would swallow the sub-command, each value is joined with option name instead
+        if k and v:
+            for item in v if isinstance(v, list) else [v]:
+                self.__append('%s=%s' %(k, item))
+
     def __appendb(self, k, v):
         if k and v:
             self.__append(k)
@@ -785,21 +3481,241 @@ class _ScriptTaskArgParser(dict):
 def runTask(taskName, shared_args, **kwargs):
     '''
     task list:
-    INVOKE, BUILD, PACK_ANDROID, PACK_IOS, COPY, DEL
+    INVOKE, SYMBOLS, DAEMON, BUILD, BUNDLES, MATRIX, PACK_ANDROID, PACK_IOS, PROV, FETCH, COPY, DEL
 
     argument name list:
-    shared:         log, wmode, unityHome, unityLog, buildTarget, nobatch, noquit, unityExtraArgs
+    shared:         log, wmode, logMaxSize, report, unityHome, unityExe, unityLog, buildTarget, failfast, nobatch, noquit, libcache, install, cleanup, unityExtraArgs, jobs, transfer, timeouts, store, storeBudget
     invoke:         projPath, calls
-    build:          projPath, buildTarget, outPath, opt, exp, dev, dph
-    packandroid:    projPath, buildFile, task, var, pfx, sfx, prop, ndp
-    packios:        projPath, provFile, outFile, archiveFile, proName, debug, target, sdk, keychain, opt, ndo
-    copy:           src, dst, append, stat
-    del:            src, sfx
+    symbols:        projPath, add, remove
+    daemon:         projPath, port, timeout, stop
+    build:          projPath, buildTarget, outPath, opt, exp, dev, dph, cache, archive
+    bundles:        projPath, buildTarget, outPath, opt, stage
+    matrix:         projPath, outPath, targets, workDir, parallel, opt, cache
+    packandroid:    projPath, buildFile, task, var, pfx, sfx, prop, ndp, daemon, buildCache, configCache, parallel
+    packios:        projPath, provFile, outFile, archiveFile, proName, debug, target, sdk, keychain, opt, ndo, incremental, parallelizeTargets
+    prov:           dirs, bundleId, type, teamId
+    fetch:          storeDir, artifact, dst
+    copy:           src, dst, append, stat, sync, checksum, prune
+    del:            src, sfx, background
+
+    return phase records of the task, each record is a dict with phase, start, time, ok and phase specific keys
     '''
+    if _taskBatch != None:
+        if taskName in [INVOKE, SYMBOLS, BUILD]:
+            if not _taskBatch.accept(taskName, shared_args, kwargs):
+                flushTasks()
+                _taskBatch.accept(taskName, shared_args, kwargs)
+            return None
+        flushTasks()
+
     parser = _ScriptTaskArgParser(shared_args, cmd = taskName)
     parser.update(kwargs)
     explictArgs = parser.parse()
-    _run(_parse_args(explictArgs))
+    return _run(_parse_args(explictArgs))
+
+class _TaskBatch:
+    def __init__(self):
+        self.tasks = []
+        pass
+
+    def accept(self, taskName, shared_args, kwargs):
+        if self.tasks:
+            firstName, firstShared, firstKwargs = self.tasks[0]
+            if dict(shared_args or {}) != firstShared or _fullPath(kwargs.get('projPath')) != _fullPath(firstKwargs.get('projPath')):
+                return False
+            #one build per unity launch
+            if taskName == BUILD and any(t[0] == BUILD for t in self.tasks):
+                return False
+            #cache key of build covers project settings and symbols, which held back tasks may still change
+            if taskName == BUILD and kwargs.get('cache'):
+                return False
+        self.tasks.append((taskName, dict(shared_args or {}), dict(kwargs)))
+        return True
+    pass
+
+#held back INVOKE, SYMBOLS and BUILD tasks, None when batching is disabled
+_taskBatch = None
+
+def batchTasks(enabled = True):
+    '''
+    when enabled, consecutive INVOKE, SYMBOLS and BUILD tasks with the same projPath and shared_args are held back by runTask,
+    and run in one unity launch as a chained invoke when another task runs or flushTasks is called.
+    held back tasks are also flushed at exit.
+    '''
+    global _taskBatch
+    if enabled:
+        if _taskBatch == None:
+            import atexit
+            atexit.register(_flushAtExit)
+            _taskBatch = _TaskBatch()
+    elif _taskBatch != None:
+        flushTasks()
+        _taskBatch = None
+    pass
+
+def flushTasks():
+    '''
+    run held back tasks, return result of each task, result is a dict with task, status (ok, failed, skipped) and log
+    '''
+    if _taskBatch == None or not _taskBatch.tasks:
+        return []
+    tasks = _taskBatch.tasks
+    _taskBatch.tasks = []
+
+    argsList = []
+    for taskName, shared, kwargs in tasks:
+        parser = _ScriptTaskArgParser(shared, cmd = taskName)
+        parser.update(kwargs)
+        argsList.append(_parse_args(parser.parse()))
+    _prepareRun(argsList[0])
+    try:
+        with _Phase('task', cmd = '_batchCmd'):
+            return _batchCmd(argsList)
+    finally:
+        _pendingDeletes.wait()
+        _report.flush()
+        _logPipeline.flush()
+
+def _flushAtExit():
+    try:
+        flushTasks()
+    except SystemExit as e:
+        #exit code of atexit handlers is ignored
+        _logPipeline.stop()
+        logging.shutdown()
+        os._exit(e.code if isinstance(e.code, int) else 1)
+    pass
+
+class TaskGraph:
+    '''
+    run tasks with dependencies, independent tasks run concurrently, each task in its own buildutil process
+
+    usage:
+        graph = TaskGraph(shared_args, workers = 4)
+        graph.add('settings', INVOKE, projPath = UNITY_PROJ, calls = [...])
+        graph.add('build', BUILD, deps = ['settings'], projPath = UNITY_PROJ, buildTarget = 'android', outPath = EXPORT_PROJ)
+        graph.add('pack', PACK_ANDROID, deps = ['build'], projPath = EXPORT_PROJ, task = 'assembleRelease')
+        results = graph.run()
+
+    INVOKE, SYMBOLS, DAEMON, BUILD, BUNDLES and MATRIX tasks hold a lock of their projPath, tasks sharing a lock never run at the same time,
+    extra lock names can be given with locks argument. tasks depend on a failed task are skipped.
+    timeouts in shared args also limit each task process with phase graph, e.g. graph=7200.
+    logging of the caller is kept, it is only set up to stdout when not configured yet.
+
+    run() returns dict of task name to result, result is a dict with task, status (ok, failed, skipped), code, start, time and records
+    '''
+    UnityTasks = [INVOKE, SYMBOLS, DAEMON, BUILD, BUNDLES, MATRIX]
+
+    def __init__(self, shared_args, workers = None):
+        self.__shared = dict(shared_args or {})
+        self.__workers = workers or os.cpu_count() or 1
+        self.__nodes = {}
+        self.__order = []
+        pass
+
+    def add(self, name, taskName, deps = None, locks = None, **kwargs):
+        if name in self.__nodes:
+            raise ValueError('duplicated task name: %s' %name)
+        locks = set(locks or [])
+        if taskName in TaskGraph.UnityTasks and kwargs.get('projPath'):
+            locks.add('project:%s' %_fullPath(kwargs['projPath']))
+        self.__nodes[name] = (taskName, list(deps or []), locks, kwargs)
+        self.__order.append(name)
+        return self
+
+    def run(self):
+        import tempfile
+        from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+        if not logging.getLogger().handlers:
+            _initLogging(None, None, False)
+        _handleTerminate()
+        order = self.__sortedNames()
+
+        #log file is truncated once for all tasks
+        shared = dict(self.__shared)
+        if shared.get('log') and shared.pop('wmode', None):
+            open(_fullPath(shared['log']), 'w').close()
+        sharedReport = _fullPath(shared.pop('report', None))
+        timeouts = shared.get('timeouts') or []
+        self.__timeout = _parseTimeouts([timeouts] if isinstance(timeouts, str) else timeouts).get('graph')
+
+        results = {}
+        running = {}
+        heldLocks = set()
+        tmpDir = tempfile.mkdtemp(prefix = 'buildutil-graph-')
+        start = time.time()
+        try:
+            with ThreadPoolExecutor(max_workers = self.__workers) as pool:
+                while True:
+                    for name in order:
+                        if name in results or name in running.values():
+                            continue
+                        taskName, deps, locks, kwargs = self.__nodes[name]
+                        if any(d in results and results[d]['status'] != 'ok' for d in deps):
+                            results[name] = {'task': taskName, 'status': 'skipped', 'code': None, 'start': None, 'time': 0, 'records': []}
+                            _logInfo('[graph] %s skipped' %name)
+                        elif all(d in results for d in deps) and not (locks & heldLocks) and len(running) < self.__workers:
+                            heldLocks |= locks
+                            reportFile = os.path.join(tmpDir, '%s.json' %self.__order.index(name))
+                            future = pool.submit(self.__runNode, name, shared, reportFile)
+                            running[future] = name
+                            _logInfo('[graph] %s started' %name)
+                    if not running:
+                        break
+
+                    done, _ = wait(list(running), return_when = FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        heldLocks -= self.__nodes[name][2]
+                        results[name] = future.result()
+                        if sharedReport:
+                            with open(sharedReport, 'a') as f:
+                                for record in results[name]['records']:
+                                    f.write(json.dumps(dict(record, task = name)) + '\n')
+                        _logInfo('[graph] %s %s with code %s in %.1fs' %(name, results[name]['status'],
+                                                                        results[name]['code'], results[name]['time']))
+        finally:
+            shutil.rmtree(tmpDir, ignore_errors = True)
+        _logInfo('[graph] %s tasks finished in %.1fs' %(len(results), time.time() - start))
+        return results
+
+    def __runNode(self, name, shared, reportFile):
+        taskName, deps, locks, kwargs = self.__nodes[name]
+        parser = _ScriptTaskArgParser(shared, cmd = taskName)
+        parser.update(kwargs)
+        parser['report'] = reportFile
+        argList = [sys.executable, os.path.abspath(__file__)] + parser.parse()
+
+        start = time.time()
+        #task process writes its own output, the process tree is killed on timeout or SIGTERM
+        code = _call(argList, 'graph', timeout = self.__timeout, grace = 10, stdout = None)
+        records = []
+        if os.path.isfile(reportFile):
+            with open(reportFile) as f:
+                records = [json.loads(line) for line in f if line.strip()]
+        return {'task': taskName, 'status': 'ok' if code == 0 else 'failed', 'code': code,
+                'start': start, 'time': time.time() - start, 'records': records}
+
+    def __sortedNames(self):
+        for name in self.__order:
+            for dep in self.__nodes[name][1]:
+                if dep not in self.__nodes:
+                    raise ValueError('task %s depends on unknown task: %s' %(name, dep))
+        order = []
+        visiting = set()
+        def visit(name):
+            if name in order:
+                return
+            if name in visiting:
+                raise ValueError('circular dependency found at task: %s' %name)
+            visiting.add(name)
+            for dep in self.__nodes[name][1]:
+                visit(dep)
+            visiting.discard(name)
+            order.append(name)
+        for name in self.__order:
+            visit(name)
+        return order
     pass
 
 if __name__ == '__main__':